@@ -1,20 +1,37 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict
+from typing import Iterable, List, Literal, Optional, Dict, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 import bcrypt
+import brotli
 import jwt
 import httpx
+import numpy as np
+import orjson
 from decimal import Decimal
+from email.utils import parsedate_to_datetime
 import asyncio
+import base64
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,20 +41,67 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Indexes backing the hot queries, created on startup
+DB_INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique")
+    ],
+    "portfolios": [
+        IndexModel([("user_id", ASCENDING), ("crypto_id", ASCENDING)], unique=True, name="user_crypto_unique")
+    ],
+    "transactions": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="user_timestamp_id")
+    ],
+    "candles": [
+        IndexModel([("coin", ASCENDING), ("resolution", ASCENDING), ("t", ASCENDING)], unique=True, name="coin_resolution_t"),
+        IndexModel([("expire_at", ASCENDING)], expireAfterSeconds=0, name="expire_at_ttl")
+    ]
+}
+# Indexes made redundant by a newer definition above
+DB_DROPPED_INDEXES = {
+    "transactions": ["user_timestamp"]
+}
+
+async def ensure_indexes():
+    """Create missing indexes; a failure on one collection (e.g. existing duplicates) is logged, not fatal."""
+    async def create(collection: str, indexes: List[IndexModel]):
+        try:
+            await db[collection].create_indexes(indexes)
+            existing = await db[collection].index_information()
+            for name in DB_DROPPED_INDEXES.get(collection, []):
+                if name in existing:
+                    await db[collection].drop_index(name)
+        except Exception as e:
+            logger.error(f"Failed to create indexes on {collection}: {e}")
+    
+    await asyncio.gather(*(create(collection, indexes) for collection, indexes in DB_INDEXES.items()))
+
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION = 24  # hours
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', 5))  # seconds a loaded user is reused
 
 security = HTTPBearer()
 
+# Password hashing pool (bcrypt is CPU bound and must not run on the event loop)
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', min(4, os.cpu_count() or 1)))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', 32))  # waiting calls before 503
+
 # Cache for CoinGecko API calls
-crypto_cache: Dict[str, dict] = {}
-cache_timestamps: Dict[str, datetime] = {}
 CACHE_DURATION = 60  # seconds
+CACHE_STALE_DURATION = int(os.environ.get('CACHE_STALE_DURATION', 3600))  # seconds stale data may still be served
+CHART_CACHE_MAX_ENTRIES = int(os.environ.get('CHART_CACHE_MAX_ENTRIES', 512))
+CHART_CACHE_MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CANONICAL_CHART_DAYS = ["1", "7", "30", "90", "365", "max"]
+# Shared L2 cache so several workers/replicas fetch each key once per TTL
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_NAMESPACE = os.environ.get('CACHE_NAMESPACE', 'crypto-trader:')
+CACHE_LOCK_TTL = 30  # seconds a worker may hold an upstream fetch lock
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -112,6 +176,56 @@ class BuySellRequest(BaseModel):
     quantity: float
     price_per_unit: float
 
+class OrderRequest(BuySellRequest):
+    transaction_type: Literal["buy", "sell"]
+
+class BatchOrderRequest(BaseModel):
+    orders: List[OrderRequest] = Field(..., min_length=1, max_length=50)
+
+class BoundedExecutor:
+    """Thread pool for blocking calls that sheds load once its queue is full.
+
+    At most max_workers calls run at once and max_queue more may wait; any
+    call beyond that fails fast with a 503 instead of queueing unboundedly.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again in a moment.",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+password_pool = BoundedExecutor("bcrypt", BCRYPT_WORKERS, BCRYPT_MAX_QUEUE)
+
 # Helper Functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -119,29 +233,54 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-def create_access_token(user_id: str) -> str:
+def create_access_token(user_id: str, email: Optional[str] = None, name: Optional[str] = None) -> str:
     expiration = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION)
     payload = {
         "user_id": user_id,
+        "email": email,
+        "name": name,
         "exp": expiration
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def decode_access_token(credentials: HTTPAuthorizationCredentials) -> dict:
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get("user_id")
-        
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
+        return jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def load_user(user_id: str) -> dict:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    principal_cache.set(user_id, user)
+    return user
+
+def invalidate_principal(user_id: str):
+    principal_cache.delete(user_id)
+
+async def get_token_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Authenticate from JWT claims alone, without a database lookup.
+
+    For endpoints that only need the caller's id; balance is not included.
+    """
+    payload = decode_access_token(credentials)
+    return {
+        "id": payload.get("user_id"),
+        "email": payload.get("email"),
+        "name": payload.get("name")
+    }
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Authenticate and load the user, reusing a copy loaded within PRINCIPAL_CACHE_TTL."""
+    user_id = decode_access_token(credentials).get("user_id")
+    user = principal_cache.get(user_id)
+    if user is None:
+        user = await load_user(user_id)
+    return user
+
 # Auth Routes
 @api_router.post("/auth/register", response_model=TokenResponse)
 async def register(user_data: UserRegister):
@@ -156,12 +295,16 @@ async def register(user_data: UserRegister):
         name=user_data.name
     )
     user_dict = user.model_dump()
-    user_dict["password"] = hash_password(user_data.password)
+    user_dict["password"] = await password_pool.run(hash_password, user_data.password)
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration for the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create token
-    token = create_access_token(user.id)
+    token = create_access_token(user.id, user.email, user.name)
     
     return TokenResponse(
         access_token=token,
@@ -177,10 +320,10 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password"]):
+    if not user or not await password_pool.run(verify_password, credentials.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    token = create_access_token(user["id"])
+    token = create_access_token(user["id"], user["email"], user["name"])
     
     return TokenResponse(
         access_token=token,
@@ -202,413 +345,2970 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         balance=current_user["balance"]
     )
 
-# Crypto Routes
-@api_router.get("/cryptos", response_model=List[Crypto])
-async def get_cryptos(search: Optional[str] = None):
-    cache_key = "crypto_list"
-    now = datetime.now(timezone.utc)
-    
-    # Check cache
-    if cache_key in crypto_cache and cache_key in cache_timestamps:
-        age = (now - cache_timestamps[cache_key]).total_seconds()
-        if age < CACHE_DURATION:
-            cryptos = crypto_cache[cache_key]
-            # Filter by search if provided
-            if search:
-                search_lower = search.lower()
-                cryptos = [c for c in cryptos if search_lower in c.name.lower() or search_lower in c.symbol.lower()]
-            return cryptos
-    
-    try:
-        # Add delay to respect rate limits
-        await asyncio.sleep(0.5)
+# Caching
+def estimate_size(value) -> int:
+    """Approximate the memory cost of a cached value by its JSON size."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(json.dumps(value, default=lambda o: o.model_dump() if isinstance(o, BaseModel) else str(o)))
+
+class CacheEntry:
+    __slots__ = ("value", "size", "stored_at", "expires_at", "stale_until")
+
+    def __init__(self, value, size: int, stored_at: float, ttl: float, stale_ttl: float):
+        self.value = value
+        self.size = size
+        self.stored_at = stored_at
+        self.expires_at = stored_at + ttl
+        self.stale_until = self.expires_at + stale_ttl
+
+class TTLCache:
+    """Bounded in-process cache with LRU eviction and per-entry TTL.
+
+    Entries are fresh until their TTL passes and then stale for a further
+    stale_ttl seconds, during which get_entry() still returns them so callers
+    can serve stale data while revalidating. The cache is bounded both by
+    entry count and by the estimated byte size of its values.
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int, ttl: float, stale_ttl: float = 0.0, sizer=estimate_size):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.sizer = sizer
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def get_entry(self, key: str):
+        """Return (value, is_fresh), or None when missing or past its stale window."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        if now >= entry.stale_until:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if now < entry.expires_at:
+            self.hits += 1
+            return entry.value, True
+        self.stale_hits += 1
+        return entry.value, False
+
+    def get(self, key: str):
+        """Return the value only while it is fresh."""
+        entry = self.get_entry(key)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0]
+
+    def set(self, key: str, value, ttl: Optional[float] = None, stale_ttl: Optional[float] = None) -> bool:
+        size = self.sizer(value)
+        if size > self.max_bytes:
+            self.rejections += 1
+            return False
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CacheEntry(
+            value,
+            size,
+            time.monotonic(),
+            self.ttl if ttl is None else ttl,
+            self.stale_ttl if stale_ttl is None else stale_ttl
+        )
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def age(self, key: str) -> Optional[float]:
+        entry = self._entries.get(key)
+        return time.monotonic() - entry.stored_at if entry else None
+
+    def remaining(self, key: str) -> Optional[float]:
+        """Seconds until the entry goes stale (kept across L2 fills, unlike age)."""
+        entry = self._entries.get(key)
+        return max(0.0, entry.expires_at - time.monotonic()) if entry else None
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejections": self.rejections
+        }
+
+class NullCacheBackend:
+    """No shared tier: the default for a single worker without REDIS_URL."""
+
+    name = "none"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        pass
+
+    async def acquire_lock(self, key: str, ttl: float) -> bool:
+        return True
+
+    async def release_lock(self, key: str):
+        pass
+
+    async def close(self):
+        pass
+
+class InMemoryCacheBackend:
+    """Process-local stand-in for the shared L2 cache (REDIS_URL=memory://, tests)."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._locks: Dict[str, float] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        data, expires_at = item
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        return data
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        now = time.monotonic()
+        if len(self._data) >= 1024:
+            self._data = {k: v for k, v in self._data.items() if v[1] > now}
+        self._data[key] = (data, now + ttl)
+
+    async def acquire_lock(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        if self._locks.get(key, 0) > now:
+            return False
+        self._locks[key] = now + ttl
+        return True
+
+    async def release_lock(self, key: str):
+        self._locks.pop(key, None)
+
+    async def close(self):
+        pass
+
+class RedisCacheBackend:
+    """Shared L2 cache in Redis; entries expire on the Redis side as well."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        await self._redis.set(key, data, px=max(1, int(ttl * 1000)))
+
+    async def acquire_lock(self, key: str, ttl: float) -> bool:
+        return bool(await self._redis.set(key, b"1", nx=True, px=int(ttl * 1000)))
+
+    async def release_lock(self, key: str):
+        await self._redis.delete(key)
+
+    async def close(self):
+        await self._redis.aclose()
+
+def create_cache_backend():
+    if not REDIS_URL:
+        return NullCacheBackend()
+    if REDIS_URL.startswith("memory://"):
+        return InMemoryCacheBackend()
+    return RedisCacheBackend(REDIS_URL)
+
+class TieredCache:
+    """In-process TTLCache (L1) in front of a shared backend (L2).
+
+    L2 entries are orjson envelopes carrying their own store time and TTL, so
+    every worker agrees on freshness. refresh() takes a short L2 lock before
+    going upstream, which keeps N workers at about one fetch per TTL. L2
+    errors are logged and treated as misses; the L1 keeps serving.
+    """
+
+    def __init__(self, l1: TTLCache, backend, namespace: str, encode=lambda v: v, decode=lambda v: v):
+        self.l1 = l1
+        self.backend = backend
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.lock_waits = 0
+
+    def _key(self, key: str) -> str:
+        return f"{CACHE_NAMESPACE}{self.namespace}{key}"
+
+    async def _read_l2(self, key: str):
+        """Return (value, age, ttl) from L2, or None."""
+        try:
+            data = await self.backend.get(self._key(key))
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"L2 cache read failed for {key}: {e}")
+            return None
+        if data is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        envelope = orjson.loads(data)
+        return self.decode(envelope["v"]), time.time() - envelope["t"], envelope["ttl"]
+
+    def _fill_l1(self, key: str, value, age: float, ttl: float):
+        # Keep the L1 copy on the same expiry schedule as the shared entry
+        self.l1.set(key, value, ttl=max(0.0, ttl - age), stale_ttl=max(0.0, self.l1.stale_ttl - max(0.0, age - ttl)))
+
+    async def get_entry(self, key: str):
+        """Return (value, is_fresh) from L1, then L2; None on a miss."""
+        entry = self.l1.get_entry(key)
+        if entry is not None:
+            return entry
+        shared = await self._read_l2(key)
+        if shared is None:
+            return None
+        value, age, ttl = shared
+        if age >= ttl + self.l1.stale_ttl:
+            return None
+        self._fill_l1(key, value, age, ttl)
+        return value, age < ttl
+
+    async def set(self, key: str, value, ttl: Optional[float] = None):
+        ttl = self.l1.ttl if ttl is None else ttl
+        self.l1.set(key, value, ttl=ttl)
+        envelope = orjson.dumps({"t": time.time(), "ttl": ttl, "v": self.encode(value)})
+        try:
+            await self.backend.set(self._key(key), envelope, ttl + self.l1.stale_ttl)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"L2 cache write failed for {key}: {e}")
+
+    async def refresh(self, key: str, fetch, ttl: Optional[float] = None, max_age: Optional[float] = None):
+        """Fetch key upstream unless another worker stored a fresh copy; returns the value."""
+        ttl = self.l1.ttl if ttl is None else ttl
+        max_age = ttl if max_age is None else max_age
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            params = {
-                "vs_currency": "usd",
-                "order": "market_cap_desc",
-                "per_page": 100,
-                "page": 1,
-                "sparkline": "false"
-            }
-            response = await client.get(
-                "https://api.coingecko.com/api/v3/coins/markets",
-                params=params
-            )
-            
-            if response.status_code == 429:
-                logger.warning("CoinGecko rate limit hit, using cached data if available")
-                if cache_key in crypto_cache:
-                    cryptos = crypto_cache[cache_key]
-                    if search:
-                        search_lower = search.lower()
-                        cryptos = [c for c in cryptos if search_lower in c.name.lower() or search_lower in c.symbol.lower()]
-                    return cryptos
-                raise HTTPException(status_code=503, detail="Cryptocurrency data temporarily unavailable. Please try again in a moment.")
-            
-            data = response.json()
-            
-            cryptos = []
-            for item in data:
-                crypto = Crypto(
-                    id=item["id"],
-                    symbol=item["symbol"].upper(),
-                    name=item["name"],
-                    image=item["image"],
-                    current_price=item["current_price"],
-                    price_change_24h=item.get("price_change_24h", 0),
-                    price_change_percentage_24h=item.get("price_change_percentage_24h", 0),
-                    market_cap=item["market_cap"],
-                    market_cap_rank=item["market_cap_rank"],
-                    total_volume=item["total_volume"]
-                )
-                cryptos.append(crypto)
-            
-            # Update cache
-            crypto_cache[cache_key] = cryptos
-            cache_timestamps[cache_key] = now
-            
-            # Filter by search if provided
-            if search:
-                search_lower = search.lower()
-                cryptos = [c for c in cryptos if search_lower in c.name.lower() or search_lower in c.symbol.lower()]
-            
-            return cryptos
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error fetching cryptos: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch cryptocurrency data")
+        shared = await self._read_l2(key)
+        if shared is not None and shared[1] < max_age:
+            self._fill_l1(key, *shared)
+            return shared[0]
+        
+        lock_key = self._key(f"lock:{key}")
+        try:
+            locked = await self.backend.acquire_lock(lock_key, CACHE_LOCK_TTL)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"L2 cache lock failed for {key}: {e}")
+            locked = True
+        
+        if not locked:
+            # Another worker is fetching; wait briefly for its result
+            self.lock_waits += 1
+            for _ in range(20):
+                await asyncio.sleep(0.25)
+                shared = await self._read_l2(key)
+                if shared is not None and shared[1] < max_age:
+                    self._fill_l1(key, *shared)
+                    return shared[0]
+        
+        try:
+            value = await fetch()
+            await self.set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                try:
+                    await self.backend.release_lock(lock_key)
+                except Exception as e:
+                    logger.warning(f"L2 cache unlock failed for {key}: {e}")
 
-@api_router.get("/cryptos/{crypto_id}")
-async def get_crypto_details(crypto_id: str, days: str = "7"):
-    cache_key = f"crypto_detail_{crypto_id}_{days}"
-    now = datetime.now(timezone.utc)
-    
-    # Check cache
-    if cache_key in crypto_cache and cache_key in cache_timestamps:
-        age = (now - cache_timestamps[cache_key]).total_seconds()
-        if age < CACHE_DURATION:
-            return crypto_cache[cache_key]
-    
+    def stats(self) -> dict:
+        return {
+            **self.l1.stats(),
+            "l2_backend": self.backend.name,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "l2_errors": self.l2_errors,
+            "lock_waits": self.lock_waits
+        }
+
+# Market list lives in its own small cache so chart churn can never evict it
+market_cache = TTLCache("market", max_entries=16, max_bytes=8 * 1024 * 1024, ttl=CACHE_DURATION, stale_ttl=CACHE_STALE_DURATION)
+chart_cache = TTLCache("chart", max_entries=CHART_CACHE_MAX_ENTRIES, max_bytes=CHART_CACHE_MAX_BYTES, ttl=CACHE_DURATION, stale_ttl=CACHE_STALE_DURATION)
+
+cache_backend = create_cache_backend()
+market_store = TieredCache(
+    market_cache,
+    cache_backend,
+    "market:",
+    encode=lambda cryptos: [c.model_dump() for c in cryptos],
+    decode=lambda items: [Crypto(**item) for item in items]
+)
+chart_store = TieredCache(chart_cache, cache_backend, "chart:")
+# Quotes for coins outside the market list, fetched alongside their charts
+quote_cache = TTLCache("quote", max_entries=CHART_CACHE_MAX_ENTRIES, max_bytes=8 * 1024 * 1024, ttl=CACHE_DURATION, stale_ttl=CACHE_STALE_DURATION)
+quote_store = TieredCache(quote_cache, cache_backend, "quote:")
+
+# Encoded /cryptos?search= results, cleared whenever the market list changes
+MARKET_SEARCH_CACHE_SIZE = int(os.environ.get('MARKET_SEARCH_CACHE_SIZE', 256))
+MARKET_SEARCH_DEFAULT_LIMIT = 100
+MARKET_SEARCH_MAX_LIMIT = 250
+market_search_cache = TTLCache("market_search", max_entries=MARKET_SEARCH_CACHE_SIZE, max_bytes=8 * 1024 * 1024, ttl=CACHE_STALE_DURATION, sizer=lambda payload: payload.size())
+# Encoded /cryptos/{crypto_id} variants (days, points, ohlc) of the cached quote and chart parts
+detail_payload_cache = TTLCache("detail_payload", max_entries=CHART_CACHE_MAX_ENTRIES, max_bytes=CHART_CACHE_MAX_BYTES // 4, ttl=CACHE_DURATION + CACHE_STALE_DURATION, sizer=lambda entry: entry[-1].size())
+
+# Authenticated users keyed by user_id; trades invalidate their entry
+principal_cache = TTLCache("principal", max_entries=10000, max_bytes=16 * 1024 * 1024, ttl=PRINCIPAL_CACHE_TTL)
+
+def normalize_days(days: str) -> str:
+    """Map a requested chart range onto the canonical set so equivalent requests share one entry."""
+    value = days.strip().lower()
+    if value == "max":
+        return value
     try:
-        # Add delay to respect rate limits
-        await asyncio.sleep(0.5)
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get current price and basic info
-            response = await client.get(
-                "https://api.coingecko.com/api/v3/coins/markets",
-                params={
-                    "vs_currency": "usd",
-                    "ids": crypto_id
-                }
-            )
-            
-            if response.status_code == 429:
-                logger.warning(f"CoinGecko rate limit hit for {crypto_id}, using cached data if available")
-                if cache_key in crypto_cache:
-                    return crypto_cache[cache_key]
-                raise HTTPException(status_code=503, detail="Cryptocurrency data temporarily unavailable. Please try again in a moment.")
-            
-            data = response.json()
-            if not data:
-                raise HTTPException(status_code=404, detail="Cryptocurrency not found")
-            
-            # Add another delay for second API call
-            await asyncio.sleep(0.5)
-            
-            # Get historical chart data
-            chart_response = await client.get(
-                f"https://api.coingecko.com/api/v3/coins/{crypto_id}/market_chart",
-                params={
-                    "vs_currency": "usd",
-                    "days": days
-                }
-            )
-            
-            if chart_response.status_code == 429:
-                # If chart fails due to rate limit but we have basic data, return it with empty chart
-                result = {
-                    "crypto": data[0],
-                    "chart": []
-                }
-                crypto_cache[cache_key] = result
-                cache_timestamps[cache_key] = now
-                return result
-            
-            chart_data = chart_response.json()
-            
-            result = {
-                "crypto": data[0],
-                "chart": chart_data.get("prices", [])
-            }
-            
-            # Update cache
-            crypto_cache[cache_key] = result
-            cache_timestamps[cache_key] = now
-            
-            return result
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error fetching crypto details: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch cryptocurrency details")
+        requested = float(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid days value. Use one of: {', '.join(CANONICAL_CHART_DAYS)}")
+    if requested <= 0:
+        raise HTTPException(status_code=400, detail="days must be positive")
+    for canonical in CANONICAL_CHART_DAYS[:-1]:
+        if requested <= int(canonical):
+            return canonical
+    return "max"
 
-# Portfolio Routes
-@api_router.post("/portfolio/buy")
-async def buy_crypto(request: BuySellRequest, current_user: dict = Depends(get_current_user)):
-    total_cost = request.quantity * request.price_per_unit
-    
-    # Check if user has enough balance
-    if current_user["balance"] < total_cost:
-        raise HTTPException(status_code=400, detail="Insufficient balance")
-    
-    # Update user balance
-    new_balance = current_user["balance"] - total_cost
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"balance": new_balance}}
-    )
-    
-    # Create transaction
-    transaction = Transaction(
-        user_id=current_user["id"],
-        crypto_id=request.crypto_id,
-        crypto_symbol=request.crypto_symbol,
-        crypto_name=request.crypto_name,
-        transaction_type="buy",
-        quantity=request.quantity,
-        price_per_unit=request.price_per_unit,
-        total_amount=total_cost
-    )
-    await db.transactions.insert_one(transaction.model_dump())
-    
-    # Update or create portfolio entry
-    portfolio_entry = await db.portfolios.find_one({
-        "user_id": current_user["id"],
-        "crypto_id": request.crypto_id
-    }, {"_id": 0})
-    
-    if portfolio_entry:
-        # Update existing position
-        new_quantity = portfolio_entry["quantity"] + request.quantity
-        new_total_invested = portfolio_entry["total_invested"] + total_cost
-        new_avg_price = new_total_invested / new_quantity
-        
-        await db.portfolios.update_one(
-            {"user_id": current_user["id"], "crypto_id": request.crypto_id},
-            {"$set": {
-                "quantity": new_quantity,
-                "total_invested": new_total_invested,
-                "average_buy_price": new_avg_price
-            }}
-        )
-    else:
-        # Create new position
-        portfolio = Portfolio(
-            user_id=current_user["id"],
-            crypto_id=request.crypto_id,
-            crypto_symbol=request.crypto_symbol,
-            crypto_name=request.crypto_name,
-            quantity=request.quantity,
-            average_buy_price=request.price_per_unit,
-            total_invested=total_cost
-        )
-        await db.portfolios.insert_one(portfolio.model_dump())
-    
-    return {"message": "Purchase successful", "new_balance": new_balance}
+# Market Data
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+MARKET_REFRESH_INTERVAL = int(os.environ.get('MARKET_REFRESH_INTERVAL', CACHE_DURATION))  # seconds
+MARKET_COLD_START_TIMEOUT = 10.0  # seconds a request waits for the very first refresh
 
-@api_router.post("/portfolio/sell")
-async def sell_crypto(request: BuySellRequest, current_user: dict = Depends(get_current_user)):
-    # Check if user has this crypto in portfolio
-    portfolio_entry = await db.portfolios.find_one({
-        "user_id": current_user["id"],
-        "crypto_id": request.crypto_id
-    }, {"_id": 0})
-    
-    if not portfolio_entry or portfolio_entry["quantity"] < request.quantity:
-        raise HTTPException(status_code=400, detail="Insufficient crypto balance")
-    
-    total_sale = request.quantity * request.price_per_unit
-    
-    # Update user balance
-    new_balance = current_user["balance"] + total_sale
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"balance": new_balance}}
+# Shared HTTP client for upstream calls (created on startup, closed on shutdown)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5.0))  # seconds
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 15.0))  # seconds
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', 20))
+HTTP_MAX_KEEPALIVE = int(os.environ.get('HTTP_MAX_KEEPALIVE', 10))
+HTTP_KEEPALIVE_EXPIRY = 60.0  # seconds an idle connection is kept open
+
+http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        headers={"Accept": "application/json"}
     )
-    
-    # Create transaction
-    transaction = Transaction(
-        user_id=current_user["id"],
-        crypto_id=request.crypto_id,
-        crypto_symbol=request.crypto_symbol,
-        crypto_name=request.crypto_name,
-        transaction_type="sell",
-        quantity=request.quantity,
-        price_per_unit=request.price_per_unit,
-        total_amount=total_sale
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+# Request budget shared by every CoinGecko call (the free tier allows roughly 30 calls a minute)
+COINGECKO_RATE_PER_MINUTE = float(os.environ.get('COINGECKO_RATE_PER_MINUTE', 30))
+COINGECKO_BURST = int(os.environ.get('COINGECKO_BURST', 5))
+# Share of the budget set aside for catalog ingestion, so its paging never starves request-path calls
+CATALOG_RATE_PER_MINUTE = float(os.environ.get('CATALOG_RATE_PER_MINUTE', 6))
+if not 0 < CATALOG_RATE_PER_MINUTE < COINGECKO_RATE_PER_MINUTE:
+    raise ValueError(
+        f"CATALOG_RATE_PER_MINUTE ({CATALOG_RATE_PER_MINUTE}) must be positive and below "
+        f"COINGECKO_RATE_PER_MINUTE ({COINGECKO_RATE_PER_MINUTE}) so request-path calls keep a budget"
     )
-    await db.transactions.insert_one(transaction.model_dump())
-    
-    # Update portfolio
-    new_quantity = portfolio_entry["quantity"] - request.quantity
-    
-    if new_quantity > 0:
-        # Calculate new total invested proportionally
-        proportion_sold = request.quantity / portfolio_entry["quantity"]
-        new_total_invested = portfolio_entry["total_invested"] * (1 - proportion_sold)
-        
-        await db.portfolios.update_one(
-            {"user_id": current_user["id"], "crypto_id": request.crypto_id},
-            {"$set": {
-                "quantity": new_quantity,
-                "total_invested": new_total_invested
-            }}
-        )
-    else:
-        # Remove from portfolio
-        await db.portfolios.delete_one({
-            "user_id": current_user["id"],
-            "crypto_id": request.crypto_id
-        })
-    
-    return {"message": "Sale successful", "new_balance": new_balance}
+UPSTREAM_MAX_WAIT = float(os.environ.get('UPSTREAM_MAX_WAIT', 5.0))  # seconds a request-path call may queue for budget
+RATE_LIMIT_BASE_BACKOFF = 5.0  # seconds paused after a 429 without Retry-After, doubling per repeat
+RATE_LIMIT_MAX_BACKOFF = 120.0
 
-@api_router.get("/portfolio")
-async def get_portfolio(current_user: dict = Depends(get_current_user)):
-    portfolios = await db.portfolios.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    return portfolios
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
 
-@api_router.get("/portfolio/summary")
-async def get_portfolio_summary(current_user: dict = Depends(get_current_user)):
-    """Get portfolio summary with current values and performance"""
-    portfolios = await db.portfolios.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    
-    if not portfolios:
+class TokenBucket:
+    """Async token bucket: refills rate tokens a second up to capacity.
+
+    acquire() returns immediately while tokens are left and otherwise
+    reserves the next one and sleeps until it is due; waiters are served in
+    order, and a bounded caller is rejected up front when the queue ahead
+    of it is longer than its max_wait.
+    backoff() empties the bucket and stops refilling until the upstream's
+    Retry-After (or an exponential default) has passed.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"Token bucket needs a positive rate and capacity, got {rate}/s and {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()  # refilling resumes from here; in the future while paused
+        self._generation = 0  # bumped by backoff(), which voids outstanding reservations
+        self._consecutive_limits = 0
+        self.acquired = 0
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self.rejections = 0
+        self.backoffs = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _delay(self) -> float:
+        paused = max(0.0, self.updated - time.monotonic())
+        return paused + max(0.0, (1 - self.tokens) / self.rate)
+
+    async def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """Take a token, waiting if needed; False if that would exceed max_wait seconds."""
+        started = time.monotonic()
+        while True:
+            self._refill()
+            delay = self._delay()
+            if max_wait is not None and time.monotonic() - started + delay > max_wait:
+                self.rejections += 1
+                return False
+            # Reserve before sleeping (tokens may go negative), so a long
+            # wait never holds up a caller with a tighter max_wait
+            self.tokens -= 1
+            if delay <= 0:
+                self.acquired += 1
+                return True
+            generation = self._generation
+            self.waits += 1
+            self.waited_seconds += delay
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                if generation == self._generation:
+                    self.tokens += 1
+                raise
+            if generation == self._generation:
+                self.acquired += 1
+                return True
+            # A backoff during the wait dropped every reservation; queue again
+
+    def backoff(self, retry_after: Optional[float]):
+        self._consecutive_limits += 1
+        self.backoffs += 1
+        if retry_after is None:
+            retry_after = min(RATE_LIMIT_MAX_BACKOFF, RATE_LIMIT_BASE_BACKOFF * 2 ** (self._consecutive_limits - 1))
+        resume = time.monotonic() + retry_after
+        if resume > self.updated:
+            self.tokens = 0.0
+            self.updated = resume
+            self._generation += 1
+
+    def succeeded(self):
+        self._consecutive_limits = 0
+
+    def stats(self) -> dict:
+        self._refill()
         return {
-            "total_value": 0,
-            "total_invested": 0,
-            "total_profit": 0,
-            "profit_percentage": 0,
-            "holdings": [],
-            "top_performers": [],
-            "top_losers": []
+            "rate_per_second": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "paused_seconds": round(max(0.0, self.updated - time.monotonic()), 3),
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "waited_seconds": round(self.waited_seconds, 3),
+            "rejections": self.rejections,
+            "backoffs": self.backoffs
         }
+
+upstream_limiter = TokenBucket((COINGECKO_RATE_PER_MINUTE - CATALOG_RATE_PER_MINUTE) / 60, COINGECKO_BURST)
+catalog_limiter = TokenBucket(CATALOG_RATE_PER_MINUTE / 60, 1)
+
+# Circuit breaker around CoinGecko
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))  # consecutive failures that open it
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_RESET_TIMEOUT', 30.0))  # seconds open before a trial call
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one upstream.
+
+    failure_threshold consecutive failures (connection errors, timeouts,
+    5xx) open it, and while open before_call() raises CircuitOpen without
+    any I/O. After reset_timeout one trial call is let through (half-open):
+    success closes the circuit, failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def reject_if_open(self):
+        """Raise CircuitOpen while open, without taking the half-open trial slot."""
+        if self.is_open:
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name} circuit is open")
+
+    def before_call(self) -> bool:
+        """Admit a call or raise CircuitOpen; True if the call took the half-open trial slot."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpen(f"{self.name} circuit is open")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpen(f"{self.name} circuit is half-open, trial call in flight")
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Free the half-open trial slot when the trial call ended without an outcome (e.g. cancelled).
+
+        Only the caller whose before_call() returned True may release.
+        """
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_seconds": time.monotonic() - self.opened_at if self.state == self.OPEN else None,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected
+        }
+
+upstream_breaker = CircuitBreaker("CoinGecko", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+async def coingecko_get(
+    path: str,
+    params: Optional[dict] = None,
+    read_timeout: Optional[float] = None,
+    max_wait: Optional[float] = UPSTREAM_MAX_WAIT,
+    limiter: TokenBucket = upstream_limiter
+) -> httpx.Response:
+    """GET a CoinGecko endpoint over the shared pooled client, within limiter's request budget.
+
+    Raises CircuitOpen straight away while the breaker is open, and again
+    if it opened while the call waited. Waits at most max_wait seconds
+    (None: as long as it takes) for budget and raises UpstreamRateLimited
+    beyond that. A 429 pauses every budget
+    until its Retry-After has passed.
+    """
+    upstream_breaker.reject_if_open()
+    if not await limiter.acquire(max_wait):
+        raise UpstreamRateLimited(f"CoinGecko request budget exhausted for {path}")
+    # The circuit may have opened while this call queued for budget
+    trial = upstream_breaker.before_call()
+    timeout = httpx.USE_CLIENT_DEFAULT
+    if read_timeout is not None:
+        timeout = httpx.Timeout(read_timeout, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_CONNECT_TIMEOUT)
+    try:
+        response = await get_http_client().get(f"{COINGECKO_API_URL}{path}", params=params, timeout=timeout)
+    except httpx.TransportError:
+        upstream_breaker.record_failure()
+        raise
+    except BaseException:
+        if trial:
+            upstream_breaker.release()
+        raise
     
-    # Get current prices for all cryptos
-    cache_key = "crypto_list"
-    
-    # Try to get from cache first
-    if cache_key in crypto_cache:
-        cryptos = crypto_cache[cache_key]
+    if response.status_code >= 500:
+        upstream_breaker.record_failure()
     else:
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                params = {
-                    "vs_currency": "usd",
-                    "order": "market_cap_desc",
-                    "per_page": 100,
-                    "page": 1,
-                    "sparkline": "false"
-                }
-                response = await client.get(
-                    "https://api.coingecko.com/api/v3/coins/markets",
-                    params=params
-                )
-                data = response.json()
-                cryptos = [Crypto(
-                    id=item["id"],
-                    symbol=item["symbol"].upper(),
-                    name=item["name"],
-                    image=item["image"],
-                    current_price=item["current_price"],
-                    price_change_24h=item.get("price_change_24h", 0),
-                    price_change_percentage_24h=item.get("price_change_percentage_24h", 0),
-                    market_cap=item["market_cap"],
-                    market_cap_rank=item["market_cap_rank"],
-                    total_volume=item["total_volume"]
-                ) for item in data]
-                crypto_cache[cache_key] = cryptos
-                cache_timestamps[cache_key] = datetime.now(timezone.utc)
-        except Exception as e:
-            logger.error(f"Error fetching crypto prices: {e}")
-            cryptos = []
-    
-    # Create price map
-    price_map = {c.id: c.current_price for c in cryptos}
-    
-    # Calculate holdings with performance
-    holdings = []
-    total_value = 0
-    total_invested = 0
-    
-    for portfolio in portfolios:
-        current_price = price_map.get(portfolio["crypto_id"], 0)
-        current_value = portfolio["quantity"] * current_price
-        profit = current_value - portfolio["total_invested"]
-        profit_percentage = (profit / portfolio["total_invested"] * 100) if portfolio["total_invested"] > 0 else 0
+        upstream_breaker.record_success()
+    if response.status_code == 429:
+        retry_after = parse_retry_after(response.headers.get("retry-after"))
+        for bucket in (upstream_limiter, catalog_limiter):
+            bucket.backoff(retry_after)
+        logger.warning(f"CoinGecko rate limit hit on {path}, pausing upstream calls for {retry_after or 'a backoff period'}s")
+    else:
+        for bucket in (upstream_limiter, catalog_limiter):
+            bucket.succeeded()
+    return response
+
+class UpstreamUnavailable(Exception):
+    """CoinGecko cannot be used right now; callers fall back to stored data."""
+
+class UpstreamRateLimited(UpstreamUnavailable):
+    """Raised when CoinGecko answers with HTTP 429."""
+
+class CircuitOpen(UpstreamUnavailable):
+    """Raised without calling CoinGecko while the circuit breaker is open."""
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight fetch.
+
+    The first caller for a key starts the fetch as its own task; callers that
+    arrive while it is running await the same task instead of going upstream.
+    Cancelling one caller (e.g. a client disconnect) does not cancel the fetch
+    for the others.
+    """
+
+    def __init__(self, history: int = 100):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.flight_count = 0
+        self.joined_count = 0
+        self.max_waiters = 0
+        self.recent = deque(maxlen=history)
+
+    async def do(self, key: str, fn):
+        task = self._flights.get(key)
+        if task is not None:
+            self._waiters[key] += 1
+            self.joined_count += 1
+            return await asyncio.shield(task)
         
-        holding = {
-            "crypto_id": portfolio["crypto_id"],
-            "crypto_name": portfolio["crypto_name"],
-            "crypto_symbol": portfolio["crypto_symbol"],
-            "quantity": portfolio["quantity"],
-            "average_buy_price": portfolio["average_buy_price"],
-            "current_price": current_price,
-            "total_invested": portfolio["total_invested"],
-            "current_value": current_value,
-            "profit": profit,
-            "profit_percentage": profit_percentage
+        task = asyncio.ensure_future(fn())
+        self._flights[key] = task
+        self._waiters[key] = 0
+        self.flight_count += 1
+        started = time.monotonic()
+        task.add_done_callback(lambda t: self._finish(key, t, started))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task, started: float):
+        waiters = self._waiters.pop(key, 0)
+        self._flights.pop(key, None)
+        self.max_waiters = max(self.max_waiters, waiters)
+        self.recent.append({
+            "key": key,
+            "waiters": waiters,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "ok": not task.cancelled() and task.exception() is None
+        })
+
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._flights
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight(),
+            "flights": self.flight_count,
+            "joined_waiters": self.joined_count,
+            "avg_waiters_per_flight": self.joined_count / self.flight_count if self.flight_count else 0,
+            "max_waiters": self.max_waiters,
+            "recent_flights": list(self.recent)[-10:]
         }
-        holdings.append(holding)
-        total_value += current_value
-        total_invested += portfolio["total_invested"]
-    
-    total_profit = total_value - total_invested
-    profit_percentage = (total_profit / total_invested * 100) if total_invested > 0 else 0
-    
-    # Get top performers and losers
-    sorted_holdings = sorted(holdings, key=lambda x: x["profit_percentage"], reverse=True)
-    top_performers = sorted_holdings[:3]
-    top_losers = sorted_holdings[-3:][::-1] if len(sorted_holdings) > 3 else []
-    
-    return {
-        "total_value": total_value,
-        "total_invested": total_invested,
-        "total_profit": total_profit,
-        "profit_percentage": profit_percentage,
-        "holdings": holdings,
-        "top_performers": top_performers,
-        "top_losers": top_losers
+
+upstream_flights = SingleFlight()
+background_tasks = set()
+
+def _background_task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background revalidation failed: {task.exception()}")
+
+def revalidate_in_background(key: str, fn):
+    """Refresh a stale cache entry without making the caller wait for it."""
+    if upstream_flights.is_in_flight(key):
+        return
+    task = asyncio.create_task(upstream_flights.do(key, fn))
+    background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+
+def parse_crypto(item: dict) -> Crypto:
+    return Crypto(
+        id=item["id"],
+        symbol=item["symbol"].upper(),
+        name=item["name"],
+        image=item["image"],
+        current_price=item["current_price"],
+        price_change_24h=item.get("price_change_24h", 0),
+        price_change_percentage_24h=item.get("price_change_percentage_24h", 0),
+        market_cap=item["market_cap"],
+        market_cap_rank=item["market_cap_rank"],
+        total_volume=item["total_volume"]
+    )
+
+async def fetch_crypto_list() -> List[Crypto]:
+    """Fetch the top 100 coins by market cap from CoinGecko."""
+    params = {
+        "vs_currency": "usd",
+        "order": "market_cap_desc",
+        "per_page": 100,
+        "page": 1,
+        "sparkline": "false"
     }
+    response = await coingecko_get("/coins/markets", params=params)
+    if response.status_code == 429:
+        raise UpstreamRateLimited("CoinGecko rate limit hit while fetching market list")
+    response.raise_for_status()
+    return [parse_crypto(item) for item in response.json()]
 
-@api_router.get("/transactions")
-async def get_transactions(current_user: dict = Depends(get_current_user)):
-    transactions = await db.transactions.find(
-        {"user_id": current_user["id"]},
-        {"_id": 0}
-    ).sort("timestamp", -1).to_list(1000)
-    return transactions
+class MarketDataRefresher:
+    """Background task that keeps the "crypto_list" entry of market_cache warm.
 
-# Include router
-app.include_router(api_router)
+    Request handlers only read the cache; this task is the single place that
+    calls CoinGecko for the market list.
+    """
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_success: Optional[datetime] = None
+        self.last_attempt: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.success_count = 0
+        self.failure_count = 0
+        self.consecutive_failures = 0
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._listeners = []
+        # Last list fetched successfully (possibly by a previous process), served once the cache runs dry
+        self.last_good: Optional[List[Crypto]] = None
+        self.data_as_of: Optional[datetime] = None
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+    def add_listener(self, listener):
+        """Call listener(cryptos) after every successful refresh."""
+        self._listeners.append(listener)
+
+    def _notify(self, cryptos: List[Crypto]):
+        for listener in self._listeners:
+            try:
+                listener(cryptos)
+            except Exception as e:
+                logger.error(f"Market data listener {listener} failed: {e}")
+
+    async def refresh(self):
+        self.last_attempt = datetime.now(timezone.utc)
+        # Outlive the refresh interval so a slow refresh never opens a gap;
+        # adopt a copy another worker stored within this interval
+        cryptos = await upstream_flights.do(
+            "crypto_list",
+            lambda: market_store.refresh("crypto_list", fetch_crypto_list, ttl=self.interval * 2, max_age=self.interval)
+        )
+        self.last_success = datetime.now(timezone.utc)
+        self.last_error = None
+        self.success_count += 1
+        self.consecutive_failures = 0
+        self._ready.set()
+        self.last_good = cryptos
+        self.data_as_of = self.last_success
+        task = asyncio.create_task(self._persist(cryptos, self.last_success))
+        background_tasks.add(task)
+        task.add_done_callback(_background_task_done)
+        self._notify(cryptos)
+
+    async def _persist(self, cryptos: List[Crypto], as_of: datetime):
+        await db.market_snapshots.replace_one(
+            {"_id": "crypto_list"},
+            {"as_of": as_of.isoformat(), "items": [crypto.model_dump() for crypto in cryptos]},
+            upsert=True
+        )
+
+    async def restore(self):
+        """Load the last persisted list so a restart during an outage still has market data."""
+        try:
+            snapshot = await db.market_snapshots.find_one({"_id": "crypto_list"})
+        except Exception as e:
+            logger.warning(f"Loading the market snapshot failed: {e}")
+            return
+        if snapshot is None or self.last_good is not None:
+            return
+        self.last_good = [Crypto(**item) for item in snapshot["items"]]
+        self.data_as_of = datetime.fromisoformat(snapshot["as_of"])
+        self._notify(self.last_good)
+
+    def data_age(self) -> Optional[float]:
+        """Seconds since the newest market data we hold was fetched."""
+        if self.data_as_of is None:
+            return None
+        return (datetime.now(timezone.utc) - self.data_as_of).total_seconds()
+
+    def is_stale(self) -> bool:
+        age = self.data_age()
+        return age is None or age > self.interval * 2
+
+    def next_delay(self) -> float:
+        if not self.consecutive_failures:
+            return self.interval
+        # Retry sooner after a failure, backing off exponentially up to the interval
+        return min(self.interval, 5 * 2 ** (self.consecutive_failures - 1))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failure_count += 1
+                self.consecutive_failures += 1
+                self.last_error = str(e) or e.__class__.__name__
+                logger.warning(f"Market data refresh failed ({self.consecutive_failures} in a row): {self.last_error}")
+            await asyncio.sleep(self.next_delay())
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_ready(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def status(self) -> dict:
+        age = None
+        if self.last_success:
+            age = (datetime.now(timezone.utc) - self.last_success).total_seconds()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_attempt": self.last_attempt.isoformat() if self.last_attempt else None,
+            "age_seconds": age,
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "data_age_seconds": self.data_age(),
+            "stale": self.is_stale()
+        }
+
+market_refresher = MarketDataRefresher(MARKET_REFRESH_INTERVAL)
+
+# Price Stream
+PRICE_STREAM_QUEUE_SIZE = 8  # undelivered events per client before it is resynced
+PRICE_STREAM_KEEPALIVE = 15.0  # seconds between SSE keep-alive comments
+PRICE_STREAM_MAX_IDS = 200
+
+PRICE_TICK_FIELDS = ("current_price", "price_change_24h", "price_change_percentage_24h")
+
+def price_tick(crypto: Crypto) -> dict:
+    return {name: getattr(crypto, name) for name in PRICE_TICK_FIELDS}
+
+def sse_event(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+class PriceStreamClient:
+    __slots__ = ("ids", "queue")
+
+    def __init__(self, ids: Optional[frozenset]):
+        self.ids = ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=PRICE_STREAM_QUEUE_SIZE)
+
+class PriceBroadcaster:
+    """Fan out market ticks to streaming clients as per-coin deltas.
+
+    Clients are grouped by their subscribed id set, and each tick's delta is
+    serialized once per group rather than once per client. A client that
+    falls PRICE_STREAM_QUEUE_SIZE events behind has its queue replaced by a
+    fresh snapshot. Subscribed coins outside the market list are priced
+    from the catalog; the unfiltered stream carries the market list only.
+    """
+
+    def __init__(self):
+        self.prices: Dict[str, dict] = {}
+        self.tail_prices: Dict[str, dict] = {}
+        self.catalog: Optional["MarketCatalog"] = None
+        self.version = 0
+        self._groups: Dict[Optional[frozenset], set] = {}
+        self.events_serialized = 0
+        self.resyncs = 0
+
+    def subscribe(self, ids: Optional[frozenset]) -> PriceStreamClient:
+        client = PriceStreamClient(ids)
+        self._groups.setdefault(ids, set()).add(client)
+        return client
+
+    def unsubscribe(self, client: PriceStreamClient):
+        group = self._groups.get(client.ids)
+        if group is not None:
+            group.discard(client)
+            if not group:
+                del self._groups[client.ids]
+
+    def _catalog_tick(self, crypto_id: str) -> Optional[dict]:
+        catalog = self.catalog
+        i = catalog.rows.get(crypto_id) if catalog is not None else None
+        return None if i is None else {name: catalog.numeric[name][i].item() for name in PRICE_TICK_FIELDS}
+
+    def _tail(self, prices: Dict[str, dict]) -> Dict[str, dict]:
+        """Catalog ticks for subscribed coins missing from prices."""
+        wanted = set().union(*(ids for ids in self._groups if ids is not None)) - prices.keys()
+        ticks = {crypto_id: self._catalog_tick(crypto_id) for crypto_id in wanted}
+        return {k: v for k, v in ticks.items() if v is not None}
+
+    def snapshot(self, ids: Optional[frozenset]) -> bytes:
+        if ids is None:
+            prices = self.prices
+        else:
+            prices = {}
+            for crypto_id in ids:
+                tick = self.prices.get(crypto_id) or self.tail_prices.get(crypto_id) or self._catalog_tick(crypto_id)
+                if tick is not None:
+                    prices[crypto_id] = tick
+        return sse_event("snapshot", {"version": self.version, "prices": prices})
+
+    def publish(self, cryptos: List[Crypto]):
+        prices = {crypto.id: price_tick(crypto) for crypto in cryptos}
+        self._broadcast(prices, self._tail(prices))
+
+    def set_catalog(self, catalog: "MarketCatalog"):
+        """Reprice subscribed long-tail coins (a catalog ingester listener)."""
+        self.catalog = catalog
+        self._broadcast(self.prices, self._tail(self.prices))
+
+    def _broadcast(self, prices: Dict[str, dict], tail: Dict[str, dict]):
+        changed = {k: v for k, v in prices.items() if self.prices.get(k) != v}
+        changed_tail = {k: v for k, v in tail.items() if self.tail_prices.get(k) != v}
+        self.prices = prices
+        self.tail_prices = tail
+        self.version += 1
+        if not changed and not changed_tail:
+            return
+        for ids, clients in self._groups.items():
+            if ids is None:
+                delta = changed
+            else:
+                delta = {k: v for k, v in changed.items() if k in ids}
+                delta.update((k, v) for k, v in changed_tail.items() if k in ids)
+            if not delta:
+                continue
+            event = sse_event("delta", {"version": self.version, "prices": delta})
+            self.events_serialized += 1
+            for client in clients:
+                try:
+                    client.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self.resync(client)
+
+    def resync(self, client: PriceStreamClient):
+        while not client.queue.empty():
+            client.queue.get_nowait()
+        client.queue.put_nowait(self.snapshot(client.ids))
+        self.resyncs += 1
+
+    def stats(self) -> dict:
+        return {
+            "clients": sum(len(clients) for clients in self._groups.values()),
+            "subscription_groups": len(self._groups),
+            "version": self.version,
+            "events_serialized": self.events_serialized,
+            "resyncs": self.resyncs
+        }
+
+price_broadcaster = PriceBroadcaster()
+market_refresher.add_listener(price_broadcaster.publish)
+
+async def get_cached_crypto_list() -> Optional[List[Crypto]]:
+    """Return the cached market list (stale if the refresher is failing).
+
+    Only waits when the very first refresh has not completed yet and the
+    circuit is not open. Once the cache has run dry the last-known-good
+    list is returned instead.
+    """
+    entry = await market_store.get_entry("crypto_list")
+    if entry is None and not upstream_breaker.is_open and await market_refresher.wait_ready(MARKET_COLD_START_TIMEOUT):
+        entry = await market_store.get_entry("crypto_list")
+    return entry[0] if entry else market_refresher.last_good
+
+def staleness_headers(stale: bool, age: Optional[float]) -> Dict[str, str]:
+    """Flag a response built from data the upstream could not refresh."""
+    if not stale:
+        return {}
+    headers = {"X-Stale": "true"}
+    if age is not None:
+        headers["X-Data-Age"] = str(int(age))
+    return headers
+
+# Conditional and compressed responses
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSION_OVERHEAD_BYTES = 64  # worst-case growth of incompressible bodies
+COMPRESSORS = {
+    "br": lambda body: brotli.compress(body, quality=5),
+    "gzip": lambda body: gzip.compress(body, compresslevel=6)
+}
+
+class EncodedPayload:
+    """One version of a JSON body with its strong ETag.
+
+    Compressed variants are made the first time a client asks for them and
+    kept for as long as the payload itself, so each version is compressed
+    at most once per encoding.
+    """
+
+    __slots__ = ("body", "etag", "_compressed")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self._compressed: Dict[str, bytes] = {}
+
+    def compressed(self, encoding: str) -> bytes:
+        data = self._compressed.get(encoding)
+        if data is None:
+            data = self._compressed[encoding] = COMPRESSORS[encoding](self.body)
+        return data
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """Strong ETag of the body as sent with encoding (None: uncompressed)."""
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def size(self) -> int:
+        """Bytes held once every variant exists, so a cache sizing it on insert stays within bounds.
+
+        Variants are compressed lazily, after the entry is stored; each is
+        counted as the body plus a little framing overhead.
+        """
+        if len(self.body) < COMPRESSION_MIN_BYTES:
+            return len(self.body)
+        return len(self.body) + len(COMPRESSORS) * (len(self.body) + COMPRESSION_OVERHEAD_BYTES)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in COMPRESSORS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def payload_response(request: Request, payload: EncodedPayload, max_age: float, extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a payload as 304, compressed or plain, with ETag and a max-age for the rest of its TTL.
+
+    Each content-coding is its own representation, so it gets its own
+    strong ETag and If-None-Match is checked against the selected one.
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if len(payload.body) < COMPRESSION_MIN_BYTES:
+        encoding = None
+    etag = payload.etag_for(encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max(0, int(max_age))}",
+        "Vary": "Accept-Encoding",
+        **(extra_headers or {})
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    body = payload.body
+    if encoding:
+        body = payload.compressed(encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+SEARCH_GRAM = 3  # longest n-gram indexed; longer queries intersect their n-gram postings
+EMPTY_POSTING = np.zeros(0, dtype=np.int32)
+
+class SearchIndex:
+    """Case-insensitive substring search over coin symbols and names.
+
+    Built once per market list. Every 1..SEARCH_GRAM-gram of each coin's
+    lowercased symbol and name maps to the coins containing it, so short
+    queries are a dict lookup and longer ones an intersection of postings
+    followed by a substring check on the few survivors. Results are ranked
+    by exact symbol match, then market_cap_rank.
+    """
+
+    def __init__(self, symbols: List[str], names: List[str], ranks: List[int]):
+        # The separator keeps a query from matching across symbol and name
+        self.keys = [f"{symbol.lower()}\x00{name.lower()}" for symbol, name in zip(symbols, names)]
+        self.symbols: Dict[str, List[int]] = {}
+        grams: Dict[str, set] = {}
+        for i, (symbol, key) in enumerate(zip(symbols, self.keys)):
+            self.symbols.setdefault(symbol.lower(), []).append(i)
+            for size in range(1, SEARCH_GRAM + 1):
+                for start in range(len(key) - size + 1):
+                    gram = key[start:start + size]
+                    if "\x00" not in gram:
+                        grams.setdefault(gram, set()).add(i)
+        self.grams = {gram: np.array(sorted(ids), dtype=np.int32) for gram, ids in grams.items()}
+        # Position of each coin when ordered by market cap rank (unranked coins last)
+        ranks = np.array([rank or np.iinfo(np.int32).max for rank in ranks], dtype=np.int64)
+        self.rank_position = np.empty(len(ranks), dtype=np.int64)
+        self.rank_position[np.argsort(ranks, kind="stable")] = np.arange(len(ranks))
+
+    @classmethod
+    def from_cryptos(cls, cryptos: List[Crypto]) -> "SearchIndex":
+        return cls(
+            [crypto.symbol for crypto in cryptos],
+            [crypto.name for crypto in cryptos],
+            [crypto.market_cap_rank for crypto in cryptos]
+        )
+
+    def _candidates(self, query: str) -> np.ndarray:
+        if len(query) <= SEARCH_GRAM:
+            return self.grams.get(query, EMPTY_POSTING)
+        postings = sorted(
+            (self.grams.get(query[i:i + SEARCH_GRAM], EMPTY_POSTING) for i in range(len(query) - SEARCH_GRAM + 1)),
+            key=len
+        )
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return np.array([i for i in candidates.tolist() if query in self.keys[i]], dtype=np.int32)
+
+    def search(self, query: str) -> List[int]:
+        """Indexes of matching coins, best first."""
+        query = query.lower()
+        candidates = self._candidates(query)
+        ranked = candidates[np.argsort(self.rank_position[candidates], kind="stable")].tolist()
+        exact = self.symbols.get(query)
+        if not exact:
+            return ranked
+        exact_set = set(exact)
+        return sorted(exact, key=lambda i: self.rank_position[i]) + [i for i in ranked if i not in exact_set]
+
+class MarketPayload:
+    """The market list pre-encoded as JSON payloads.
+
+    Each coin is encoded once per market list; the full body and search
+    results are joins of those fragments, so cache hits never touch the
+    pydantic models again.
+    """
+
+    def __init__(self, search_cache: TTLCache):
+        self.search_cache = search_cache
+        self.version = 0
+        self.payload = EncodedPayload(b"[]")
+        self.index = SearchIndex([], [], [])
+        self.catalog: Optional["MarketCatalog"] = None
+        self._source: Optional[List[Crypto]] = None
+        self._items: List[bytes] = []
+        self._items_by_id: Dict[str, bytes] = {}
+        self.quotes: Dict[str, dict] = {}
+
+    def update(self, cryptos: List[Crypto]):
+        """Re-encode and re-index when handed a new market list (also a refresher listener)."""
+        if cryptos is self._source:
+            return
+        self._source = cryptos
+        quotes = [crypto.model_dump() for crypto in cryptos]
+        self._items = [orjson.dumps(quote) for quote in quotes]
+        self._items_by_id = {crypto.id: item for crypto, item in zip(cryptos, self._items)}
+        self.quotes = {crypto.id: quote for crypto, quote in zip(cryptos, quotes)}
+        self.payload = EncodedPayload(self._join(self._items))
+        self.index = SearchIndex.from_cryptos(cryptos)
+        self.search_cache.clear()
+        self.version += 1
+
+    def set_catalog(self, catalog: "MarketCatalog"):
+        """Search the full catalog from now on (a catalog ingester listener)."""
+        self.catalog = catalog
+        self.search_cache.clear()
+
+    @staticmethod
+    def _join(items: List[bytes]) -> bytes:
+        return b"[" + b",".join(items) + b"]"
+
+    def full(self, cryptos: List[Crypto]) -> EncodedPayload:
+        self.update(cryptos)
+        return self.payload
+
+    def search(self, cryptos: List[Crypto], search: str, limit: int = MARKET_SEARCH_DEFAULT_LIMIT) -> EncodedPayload:
+        """The best limit matches for search, from the catalog once one is loaded."""
+        self.update(cryptos)
+        search_lower = search.lower()
+        cache_key = f"{limit}:{search_lower}"
+        payload = self.search_cache.get(cache_key)
+        if payload is None:
+            catalog = self.catalog
+            if catalog is not None and len(catalog):
+                # Coins in the market list use its fresher quote
+                items = [self._items_by_id.get(catalog.ids[i], catalog.items[i]) for i in catalog.index.search(search_lower)[:limit]]
+            else:
+                items = [self._items[i] for i in self.index.search(search_lower)[:limit]]
+            payload = EncodedPayload(self._join(items))
+            self.search_cache.set(cache_key, payload)
+        return payload
+
+market_payload = MarketPayload(market_search_cache)
+market_refresher.add_listener(market_payload.update)
+
+# Market Catalog
+CATALOG_PAGE_SIZE = 250  # CoinGecko's largest per_page
+CATALOG_MAX_PAGES = int(os.environ.get('CATALOG_MAX_PAGES', 80))
+CATALOG_CONCURRENCY = int(os.environ.get('CATALOG_CONCURRENCY', 4))  # pages in flight
+CATALOG_REFRESH_INTERVAL = float(os.environ.get('CATALOG_REFRESH_INTERVAL', 900))  # seconds
+CATALOG_RETRY_DELAY = 60.0  # seconds before retrying a failed ingestion
+CATALOG_CHUNK_SIZE = 1000  # coins per persisted document
+CATALOG_TEXT_COLUMNS = ["id", "symbol", "name", "image"]
+CATALOG_NUMERIC_COLUMNS = {
+    "current_price": np.float64,
+    "price_change_24h": np.float64,
+    "price_change_percentage_24h": np.float64,
+    "market_cap": np.float64,
+    "market_cap_rank": np.int64,
+    "total_volume": np.float64
+}
+
+def catalog_row(item: dict) -> dict:
+    """A /coins/markets item as a catalog row; the long tail has nulls, stored as 0."""
+    row = {
+        "id": item["id"],
+        "symbol": (item.get("symbol") or "").upper(),
+        "name": item.get("name") or item["id"],
+        "image": item.get("image") or ""
+    }
+    for name in CATALOG_NUMERIC_COLUMNS:
+        row[name] = item.get(name) or 0
+    return row
+
+class MarketCatalog:
+    """Every coin CoinGecko lists, stored column-wise.
+
+    Text columns are lists and numeric columns NumPy arrays, one row per
+    coin. Each row's JSON fragment, the search index and the price map are
+    built with the table, which is immutable once built.
+    """
+
+    def __init__(self, columns: Dict[str, list], updated_at: Optional[datetime] = None):
+        self.text = {name: list(columns.get(name, [])) for name in CATALOG_TEXT_COLUMNS}
+        self.numeric = {name: np.asarray(columns.get(name, []), dtype=dtype) for name, dtype in CATALOG_NUMERIC_COLUMNS.items()}
+        self.ids = self.text["id"]
+        self.updated_at = updated_at
+        self.rows = {crypto_id: i for i, crypto_id in enumerate(self.ids)}
+        self.price_map = dict(zip(self.ids, self.numeric["current_price"].tolist()))
+        self.items = [orjson.dumps(self.row(i)) for i in range(len(self.ids))]
+        self.index = SearchIndex(self.text["symbol"], self.text["name"], self.numeric["market_cap_rank"].tolist())
+
+    @classmethod
+    def from_rows(cls, rows: List[dict], updated_at: Optional[datetime] = None) -> "MarketCatalog":
+        return cls({name: [row[name] for row in rows] for name in [*CATALOG_TEXT_COLUMNS, *CATALOG_NUMERIC_COLUMNS]}, updated_at)
+
+    def row(self, i: int) -> dict:
+        row = {name: values[i] for name, values in self.text.items()}
+        row.update((name, values[i].item()) for name, values in self.numeric.items())
+        return row
+
+    def get(self, crypto_id: str) -> Optional[dict]:
+        i = self.rows.get(crypto_id)
+        return None if i is None else self.row(i)
+
+    def columns(self) -> Dict[str, list]:
+        return {**self.text, **{name: values.tolist() for name, values in self.numeric.items()}}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+class CatalogIngester:
+    """Background task that pulls every /coins/markets page into a MarketCatalog.
+
+    Pages are fetched CATALOG_CONCURRENCY at a time, within the shared
+    upstream budget, until a short page marks the end. The table is
+    persisted to the market_catalog collection in columnar chunks and
+    loaded from there on startup, so a restart serves the full universe
+    right away.
+    """
+
+    def __init__(self, interval: float, concurrency: int):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.catalog = MarketCatalog({})
+        self.last_error: Optional[str] = None
+        self.last_duration: Optional[float] = None
+        self.success_count = 0
+        self.failure_count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Call listener(catalog) whenever a new catalog is installed."""
+        self._listeners.append(listener)
+
+    def _install(self, catalog: MarketCatalog):
+        self.catalog = catalog
+        for listener in self._listeners:
+            try:
+                listener(catalog)
+            except Exception as e:
+                logger.error(f"Catalog listener {listener} failed: {e}")
+
+    async def _fetch_page(self, page: int) -> List[dict]:
+        params = {
+            "vs_currency": "usd",
+            "order": "market_cap_desc",
+            "per_page": CATALOG_PAGE_SIZE,
+            "page": page,
+            "sparkline": "false"
+        }
+        # Background work on its own budget, so queue as long as it takes
+        response = await coingecko_get("/coins/markets", params=params, read_timeout=30.0, max_wait=None, limiter=catalog_limiter)
+        if response.status_code == 429:
+            raise UpstreamRateLimited(f"CoinGecko rate limit hit on catalog page {page}")
+        response.raise_for_status()
+        return [catalog_row(item) for item in response.json()]
+
+    async def ingest(self):
+        started = time.perf_counter()
+        pages: Dict[int, List[dict]] = {}
+        next_page, last_page = 1, CATALOG_MAX_PAGES
+
+        async def worker():
+            nonlocal next_page, last_page
+            while next_page <= last_page:
+                page = next_page
+                next_page += 1
+                pages[page] = await self._fetch_page(page)
+                if len(pages[page]) < CATALOG_PAGE_SIZE:
+                    last_page = min(last_page, page)
+
+        results = await asyncio.gather(*(worker() for _ in range(self.concurrency)), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        
+        # Rankings shift while paging, so a coin can show up on two pages
+        rows, seen = [], set()
+        for page in sorted(pages):
+            for row in pages[page]:
+                if row["id"] not in seen:
+                    seen.add(row["id"])
+                    rows.append(row)
+        if errors:
+            if not rows:
+                raise errors[0]
+            # Keep the previous rows for whatever the failed pages would have covered
+            rows += [self.catalog.row(i) for i, crypto_id in enumerate(self.catalog.ids) if crypto_id not in seen]
+        
+        # A partial ingestion keeps the previous timestamp so it is retried soon
+        updated_at = datetime.now(timezone.utc) if not errors else self.catalog.updated_at or datetime.now(timezone.utc)
+        catalog = await asyncio.to_thread(MarketCatalog.from_rows, rows, updated_at)
+        self._install(catalog)
+        await self.persist(catalog)
+        self.last_duration = time.perf_counter() - started
+        if errors:
+            raise errors[0]
+
+    async def persist(self, catalog: MarketCatalog):
+        columns = catalog.columns()
+        updated_at = catalog.updated_at.isoformat()
+        chunks = [
+            {"_id": start // CATALOG_CHUNK_SIZE, "updated_at": updated_at, **{name: values[start:start + CATALOG_CHUNK_SIZE] for name, values in columns.items()}}
+            for start in range(0, len(catalog), CATALOG_CHUNK_SIZE)
+        ]
+        if chunks:
+            await db.market_catalog.bulk_write([ReplaceOne({"_id": chunk["_id"]}, chunk, upsert=True) for chunk in chunks], ordered=False)
+        await db.market_catalog.delete_many({"_id": {"$gte": len(chunks)}})
+
+    async def load(self):
+        chunks = await db.market_catalog.find().sort("_id", ASCENDING).to_list(None)
+        if not chunks:
+            return
+        if len({chunk["updated_at"] for chunk in chunks}) != 1:
+            logger.warning("Persisted market catalog is from an interrupted write, ignoring it")
+            return
+        columns = {name: [value for chunk in chunks for value in chunk[name]] for name in [*CATALOG_TEXT_COLUMNS, *CATALOG_NUMERIC_COLUMNS]}
+        updated_at = datetime.fromisoformat(chunks[0]["updated_at"])
+        self._install(await asyncio.to_thread(MarketCatalog, columns, updated_at))
+
+    def age(self) -> Optional[float]:
+        if self.catalog.updated_at is None:
+            return None
+        return (datetime.now(timezone.utc) - self.catalog.updated_at).total_seconds()
+
+    async def _run(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.warning(f"Loading the persisted market catalog failed: {e}")
+        while True:
+            age = self.age()
+            if age is not None and age < self.interval:
+                await asyncio.sleep(self.interval - age)
+            try:
+                await self.ingest()
+                self.success_count += 1
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failure_count += 1
+                self.last_error = str(e) or e.__class__.__name__
+                logger.warning(f"Market catalog ingestion failed: {self.last_error}")
+                await asyncio.sleep(CATALOG_RETRY_DELAY)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        age = self.age()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "coins": len(self.catalog),
+            "interval": self.interval,
+            "concurrency": self.concurrency,
+            "age_seconds": age,
+            "last_duration": self.last_duration,
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "last_error": self.last_error
+        }
+
+catalog_ingester = CatalogIngester(CATALOG_REFRESH_INTERVAL, CATALOG_CONCURRENCY)
+catalog_ingester.add_listener(market_payload.set_catalog)
+catalog_ingester.add_listener(price_broadcaster.set_catalog)
+
+def current_price_map(cryptos: List[Crypto]) -> Dict[str, float]:
+    """Latest known USD price per coin: the market list over the slower full catalog."""
+    prices = dict(catalog_ingester.catalog.price_map)
+    prices.update((crypto.id, crypto.current_price) for crypto in cryptos)
+    return prices
+
+# Candle Store
+# Resolution -> (bucket seconds, upstream days for the first backfill, retention days or None to keep)
+CANDLE_RESOLUTIONS = {
+    "5m": (300, "1", 2),
+    "1h": (3600, "90", 120),
+    "1d": (86400, "max", None)
+}
+# Finest resolution CoinGecko returns for each canonical range
+CHART_RESOLUTION = {"1": "5m", "7": "1h", "30": "1h", "90": "1h", "365": "1d", "max": "1d"}
+CANDLE_SYNC_INTERVAL = CACHE_DURATION  # seconds before a coin/resolution pulls its tail again
+
+def rollup_candles(points: List[list], bucket_ms: int) -> List[dict]:
+    """Roll [timestamp_ms, price] points (ascending) up into OHLC candles of bucket_ms."""
+    if not points:
+        return []
+    series = np.asarray(points, dtype=np.float64)
+    prices = series[:, 1]
+    buckets = series[:, 0].astype(np.int64) // bucket_ms * bucket_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return [
+        {"t": t, "o": o, "h": h, "l": l, "c": c}
+        for t, o, h, l, c in zip(
+            buckets[starts].tolist(),
+            prices[starts].tolist(),
+            np.maximum.reduceat(prices, starts).tolist(),
+            np.minimum.reduceat(prices, starts).tolist(),
+            prices[ends].tolist()
+        )
+    ]
+
+class CandleStore:
+    """OHLC history per coin and resolution, persisted in the candles collection.
+
+    The first request for a coin/resolution backfills it from
+    /market_chart; after that only the tail since the newest stored candle
+    is fetched (via /market_chart/range), at most once per sync interval,
+    and charts are read from Mongo.
+    """
+
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self._synced_at: Dict[tuple, float] = {}
+        self.backfills = 0
+        self.tail_syncs = 0
+        self.sync_failures = 0
+
+    async def _newest(self, coin: str, resolution: str) -> Optional[int]:
+        newest = await db.candles.find_one(
+            {"coin": coin, "resolution": resolution},
+            {"_id": 0, "t": 1},
+            sort=[("t", DESCENDING)]
+        )
+        return newest["t"] if newest else None
+
+    async def _fetch_points(self, coin: str, resolution: str, since_ms: Optional[int]) -> List[list]:
+        if since_ms is None:
+            path, params = f"/coins/{coin}/market_chart", {"vs_currency": "usd", "days": CANDLE_RESOLUTIONS[resolution][1]}
+        else:
+            path = f"/coins/{coin}/market_chart/range"
+            params = {"vs_currency": "usd", "from": since_ms // 1000, "to": int(time.time())}
+        # Long ranges are large, allow a longer read
+        response = await coingecko_get(path, params=params, read_timeout=30.0)
+        if response.status_code == 429:
+            raise UpstreamRateLimited(f"CoinGecko rate limit hit for {coin} chart")
+        response.raise_for_status()
+        return response.json().get("prices", [])
+
+    async def sync(self, coin: str, resolution: str):
+        key = (coin, resolution)
+        synced_at = self._synced_at.get(key)
+        if synced_at is not None and time.monotonic() - synced_at < self.sync_interval:
+            return
+        bucket_seconds, _, retention_days = CANDLE_RESOLUTIONS[resolution]
+        newest = await self._newest(coin, resolution)
+        points = await self._fetch_points(coin, resolution, newest)
+        if newest is None:
+            self.backfills += 1
+        else:
+            self.tail_syncs += 1
+        
+        updates = []
+        for candle in rollup_candles(points, bucket_seconds * 1000):
+            # The newest stored bucket may still be open: keep its open, widen high/low, move close
+            update = {
+                "$setOnInsert": {"o": candle["o"]},
+                "$max": {"h": candle["h"]},
+                "$min": {"l": candle["l"]},
+                "$set": {"c": candle["c"]}
+            }
+            if retention_days is not None:
+                update["$set"]["expire_at"] = datetime.fromtimestamp(candle["t"] / 1000, timezone.utc) + timedelta(days=retention_days)
+            updates.append(UpdateOne({"coin": coin, "resolution": resolution, "t": candle["t"]}, update, upsert=True))
+        if updates:
+            await db.candles.bulk_write(updates, ordered=False)
+        self._synced_at[key] = time.monotonic()
+
+    async def candles(self, coin: str, days: str) -> dict:
+        """Candles covering the canonical days range, syncing the tail first when due.
+
+        An upstream failure is logged and whatever is stored is served.
+        """
+        resolution = CHART_RESOLUTION[days]
+        synced = True
+        try:
+            # Several day ranges share one series, so their syncs share one fetch
+            await upstream_flights.do(f"candles_{coin}_{resolution}", lambda: self.sync(coin, resolution))
+        except (UpstreamUnavailable, httpx.HTTPError) as e:
+            self.sync_failures += 1
+            synced = False
+            logger.warning(f"Candle sync for {coin}/{resolution} failed, serving stored candles: {e}")
+        
+        query = {"coin": coin, "resolution": resolution}
+        if days != "max":
+            query["t"] = {"$gte": int((time.time() - int(days) * 86400) * 1000)}
+        candles = await db.candles.find(query, {"_id": 0, "t": 1, "o": 1, "h": 1, "l": 1, "c": 1}).sort("t", ASCENDING).to_list(None)
+        return {"resolution": resolution, "candles": candles, "synced": synced}
+
+    def stats(self) -> dict:
+        return {
+            "tracked_series": len(self._synced_at),
+            "backfills": self.backfills,
+            "tail_syncs": self.tail_syncs,
+            "sync_failures": self.sync_failures
+        }
+
+candle_store = CandleStore(CANDLE_SYNC_INTERVAL)
+
+# Chart Downsampling
+CHART_POINT_STEPS = [50, 100, 200, 500, 1000, 2000]  # allowed output sizes, so variants per chart stay few
+downsample_cache = TTLCache(
+    "downsample",
+    max_entries=CHART_CACHE_MAX_ENTRIES,
+    max_bytes=CHART_CACHE_MAX_BYTES // 4,
+    ttl=CACHE_DURATION + CACHE_STALE_DURATION
+)
+
+def normalize_points(points: int) -> int:
+    """Largest allowed output size not above the requested one."""
+    return max([step for step in CHART_POINT_STEPS if step <= points], default=CHART_POINT_STEPS[0])
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indexes of the points Largest-Triangle-Three-Buckets keeps out of x/y.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # The bucket after the last one is just the final point
+    avg_x = np.append(avg_x[1:], x[n - 1])
+    avg_y = np.append(avg_y[1:], y[n - 1])
+    
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        areas = np.abs((x[a] - avg_x[i]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i] - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def downsample_chart(cache_key: str, result: dict, points: int) -> dict:
+    """Detail result with chart (and candles) reduced to at most points entries, cached per size."""
+    chart = result["chart"]
+    if len(chart) <= points:
+        return result
+    # The newest point changes whenever the source chart does
+    fingerprint = [len(chart), *chart[-1]]
+    key = f"{cache_key}_{points}"
+    cached = downsample_cache.get(key)
+    if cached is None or cached["fingerprint"] != fingerprint:
+        series = np.asarray(chart, dtype=np.float64)
+        indices = lttb_indices(series[:, 0], series[:, 1], points).tolist()
+        candles = result.get("candles")
+        cached = {
+            "fingerprint": fingerprint,
+            "chart": [chart[i] for i in indices],
+            "candles": [candles[i] for i in indices] if candles else candles
+        }
+        downsample_cache.set(key, cached)
+    return {**result, "chart": cached["chart"], "candles": cached["candles"], "points": points}
+
+# Crypto Routes
+@api_router.get("/cryptos", response_model=List[Crypto])
+async def get_cryptos(
+    request: Request,
+    search: Optional[str] = None,
+    limit: int = Query(MARKET_SEARCH_DEFAULT_LIMIT, ge=1, le=MARKET_SEARCH_MAX_LIMIT)
+):
+    """The market list, or with search= the best limit matches across every listed coin."""
+    cryptos = await get_cached_crypto_list()
+    if cryptos is None:
+        raise HTTPException(status_code=503, detail="Cryptocurrency data temporarily unavailable. Please try again in a moment.")
+    
+    # Serve pre-encoded bytes; response_model only documents the shape
+    payload = market_payload.search(cryptos, search, limit) if search else market_payload.full(cryptos)
+    if market_refresher.is_stale():
+        # Last-known-good data: flag it and let clients retry right away
+        return payload_response(request, payload, 0, staleness_headers(True, market_refresher.data_age()))
+    # Clients may reuse the list until the next scheduled refresh
+    # The list is stored for two intervals, so the next refresh is one interval before it expires
+    remaining = market_cache.remaining("crypto_list") or 0
+    return payload_response(request, payload, remaining - market_refresher.interval)
+
+def normalize_quote(item: dict, zero_is_missing: bool = False) -> dict:
+    """A quote in the Crypto schema whatever its source, with None for missing values.
+
+    Catalog rows store missing numbers as 0, so zero_is_missing maps those
+    (and an empty image) back to None.
+    """
+    quote = {name: item.get(name) for name in Crypto.model_fields}
+    if quote["symbol"]:
+        quote["symbol"] = quote["symbol"].upper()
+    if zero_is_missing:
+        for name in CATALOG_NUMERIC_COLUMNS:
+            if quote[name] == 0:
+                quote[name] = None
+        quote["image"] = quote["image"] or None
+    return quote
+
+async def fetch_quote(crypto_id: str) -> dict:
+    """Fetch one coin's quote from CoinGecko; quote is None for an unknown id."""
+    response = await coingecko_get(
+        "/coins/markets",
+        params={
+            "vs_currency": "usd",
+            "ids": crypto_id
+        }
+    )
+    if response.status_code == 429:
+        raise UpstreamRateLimited(f"CoinGecko rate limit hit for {crypto_id}")
+    response.raise_for_status()
+    data = response.json()
+    return {"quote": normalize_quote(data[0]) if data else None, "as_of": datetime.now(timezone.utc).isoformat()}
+
+async def get_quote(crypto_id: str) -> Tuple[dict, dict, float]:
+    """Quote, its freshness and the max-age left, trying the cheapest source first.
+
+    Market list coins need no upstream call. Other coins use a cached
+    /coins/markets quote, or their catalog row while CoinGecko is unavailable.
+    Every source is returned in the Crypto schema (see normalize_quote).
+    """
+    cryptos = await get_cached_crypto_list()
+    if cryptos:
+        market_payload.update(cryptos)
+        quote = market_payload.quotes.get(crypto_id)
+        if quote is not None:
+            as_of = market_refresher.data_as_of
+            stale = market_refresher.is_stale()
+            max_age = 0 if stale else (market_cache.remaining("crypto_list") or 0) - market_refresher.interval
+            return quote, {"source": "market_list", "as_of": as_of.isoformat() if as_of else None, "stale": stale}, max_age
+
+    cache_key = f"crypto_quote_{crypto_id}"
+    fetch = lambda: quote_store.refresh(cache_key, lambda: fetch_quote(crypto_id))
+    entry = await quote_store.get_entry(cache_key)
+    if entry is not None:
+        result, fresh = entry
+        if not fresh and not upstream_breaker.is_open:
+            revalidate_in_background(cache_key, fetch)
+    else:
+        try:
+            result = await upstream_flights.do(cache_key, fetch)
+            fresh = True
+        except (UpstreamUnavailable, httpx.HTTPError):
+            # Coins outside the market list still have a catalog quote
+            catalog = catalog_ingester.catalog
+            row = catalog.get(crypto_id)
+            if row is None:
+                raise
+            as_of = catalog.updated_at
+            return normalize_quote(row, zero_is_missing=True), {"source": "catalog", "as_of": as_of.isoformat() if as_of else None, "stale": True}, 0
+    if result["quote"] is None:
+        raise HTTPException(status_code=404, detail="Cryptocurrency not found")
+    max_age = (quote_cache.remaining(cache_key) or 0) if fresh else 0
+    return result["quote"], {"source": "upstream", "as_of": result["as_of"], "stale": not fresh}, max_age
+
+async def fetch_chart(crypto_id: str, days: str) -> dict:
+    """Build the chart part of a detail response from the candle store."""
+    series = await candle_store.candles(crypto_id, days)
+    return {
+        "chart": [[candle["t"], candle["c"]] for candle in series["candles"]],
+        "resolution": series["resolution"],
+        "candles": [[candle["t"], candle["o"], candle["h"], candle["l"], candle["c"]] for candle in series["candles"]],
+        "synced": series["synced"],
+        "as_of": datetime.now(timezone.utc).isoformat()
+    }
+
+async def get_chart(crypto_id: str, days: str) -> Tuple[dict, dict, float]:
+    """Chart part, its freshness and the max-age left; stale while candle syncs fail."""
+    cache_key = f"crypto_chart_{crypto_id}_{days}"
+    fetch = lambda: chart_store.refresh(cache_key, lambda: fetch_chart(crypto_id, days))
+
+    # Serve stale entries while they are refreshed in the background
+    entry = await chart_store.get_entry(cache_key)
+    if entry is not None:
+        result, fresh = entry
+        if not fresh and not upstream_breaker.is_open:
+            revalidate_in_background(cache_key, fetch)
+    else:
+        # Concurrent misses for the same key share one fetch
+        result = await upstream_flights.do(cache_key, fetch)
+        fresh = True
+    stale = not fresh or not result["synced"]
+    max_age = 0 if stale else chart_cache.remaining(cache_key) or 0
+    return result, {"source": "candles", "as_of": result["as_of"], "stale": stale}, max_age
+
+def data_age(freshness: Dict[str, dict]) -> Optional[float]:
+    """Age in seconds of the oldest stale part, if any has a timestamp."""
+    ages = [
+        (datetime.now(timezone.utc) - datetime.fromisoformat(meta["as_of"])).total_seconds()
+        for meta in freshness.values()
+        if meta["stale"] and meta["as_of"]
+    ]
+    return max(ages, default=None)
+
+@api_router.get("/cryptos/{crypto_id}")
+async def get_crypto_details(
+    request: Request,
+    crypto_id: str,
+    days: str = "7",
+    ohlc: bool = False,
+    points: Optional[int] = Query(None, ge=CHART_POINT_STEPS[0])
+):
+    """Quote plus [timestamp, close] chart; ohlc=true adds [timestamp, open, high, low, close] candles.
+
+    points caps the chart size: longer series are downsampled with LTTB
+    to the largest allowed size not above it. freshness reports source,
+    as_of and stale per part; when one part is unavailable the other is
+    still served (crypto null or an empty chart).
+    """
+    days = normalize_days(days)
+    # The parts are independent, so a cold detail costs one round trip, not two
+    quote_part, chart_part = await asyncio.gather(get_quote(crypto_id), get_chart(crypto_id, days), return_exceptions=True)
+    if isinstance(quote_part, HTTPException):
+        raise quote_part
+    if isinstance(quote_part, Exception) and isinstance(chart_part, Exception):
+        logger.warning(f"Quote and chart for {crypto_id} both unavailable: {quote_part}; {chart_part}")
+        if isinstance(quote_part, (UpstreamUnavailable, httpx.HTTPError)):
+            raise HTTPException(status_code=503, detail="Cryptocurrency data temporarily unavailable. Please try again in a moment.")
+        raise HTTPException(status_code=500, detail="Failed to fetch cryptocurrency details")
+    if isinstance(quote_part, Exception):
+        logger.warning(f"Serving {crypto_id} chart without a quote: {quote_part}")
+        quote_part = (None, {"source": None, "as_of": None, "stale": True, "error": "unavailable"}, 0)
+    if isinstance(chart_part, Exception):
+        logger.warning(f"Serving {crypto_id} quote without a chart: {chart_part}")
+        empty = {"chart": [], "resolution": CHART_RESOLUTION[days], "candles": []}
+        chart_part = (empty, {"source": None, "as_of": None, "stale": True, "error": "unavailable"}, 0)
+    quote, quote_meta, quote_max_age = quote_part
+    chart, chart_meta, chart_max_age = chart_part
+    freshness = {"quote": quote_meta, "chart": chart_meta}
+
+    chart_key = f"crypto_chart_{crypto_id}_{days}"
+    variant_key = f"{chart_key}_{points}_{ohlc}"
+    cached = detail_payload_cache.get(variant_key)
+    if cached is not None and cached[0] is chart and cached[1] is quote and cached[2] == freshness:
+        payload = cached[3]
+    else:
+        variant = chart
+        if points is not None:
+            variant = downsample_chart(chart_key, variant, normalize_points(points))
+        body = {"crypto": quote, "chart": variant["chart"], "resolution": variant["resolution"]}
+        if ohlc:
+            body["candles"] = variant["candles"]
+        if "points" in variant:
+            body["points"] = variant["points"]
+        body["freshness"] = freshness
+        payload = EncodedPayload(orjson.dumps(body))
+        # Keyed to the cached parts, so refreshing either re-encodes
+        detail_payload_cache.set(variant_key, (chart, quote, freshness, payload))
+    stale = quote_meta["stale"] or chart_meta["stale"]
+    return payload_response(request, payload, min(quote_max_age, chart_max_age), staleness_headers(stale, data_age(freshness)))
+
+async def stream_prices(ids: Optional[frozenset]):
+    client = price_broadcaster.subscribe(ids)
+    try:
+        yield price_broadcaster.snapshot(ids)
+        while True:
+            try:
+                yield await asyncio.wait_for(client.queue.get(), PRICE_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+    finally:
+        price_broadcaster.unsubscribe(client)
+
+@api_router.get("/stream/prices")
+async def get_price_stream(ids: Optional[str] = None):
+    """Server-sent events: a price snapshot, then per-coin deltas after each market refresh.
+
+    Pass ids=bitcoin,ethereum to receive only those coins.
+    """
+    subscription = None
+    if ids:
+        subscription = frozenset(i.strip() for i in ids.split(",") if i.strip())
+        if len(subscription) > PRICE_STREAM_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {PRICE_STREAM_MAX_IDS} ids per stream")
+    return StreamingResponse(
+        stream_prices(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Portfolio Valuation
+VALUATION_MAX_USERS = int(os.environ.get('VALUATION_MAX_USERS', 10000))
+VALUATION_TTL = float(os.environ.get('VALUATION_TTL', 60))  # seconds before a summary is reloaded (covers trades on other workers)
+TOP_HOLDINGS = 3
+
+class HoldingColumns:
+    """Holdings as parallel NumPy arrays, with user and coin ids factorized to indexes."""
+
+    def __init__(self, user_ids: List[str], coin_ids: List[str], user_index: np.ndarray, coin_index: np.ndarray, quantity: np.ndarray, invested: np.ndarray):
+        self.user_ids = user_ids
+        self.coin_ids = coin_ids
+        self.user_index = user_index
+        self.coin_index = coin_index
+        self.quantity = quantity
+        self.invested = invested
+
+    @classmethod
+    def from_positions(cls, positions: Iterable[dict], user_ids: Iterable[str] = ()) -> "HoldingColumns":
+        """Factorize positions; user_ids pre-seeds the user order (users without positions included)."""
+        user_lookup: Dict[str, int] = {user_id: i for i, user_id in enumerate(user_ids)}
+        coin_lookup: Dict[str, int] = {}
+        user_index, coin_index, quantity, invested = [], [], [], []
+        for position in positions:
+            user_index.append(user_lookup.setdefault(position["user_id"], len(user_lookup)))
+            coin_index.append(coin_lookup.setdefault(position["crypto_id"], len(coin_lookup)))
+            quantity.append(position["quantity"])
+            invested.append(position["total_invested"])
+        return cls(
+            list(user_lookup),
+            list(coin_lookup),
+            np.array(user_index, dtype=np.int64),
+            np.array(coin_index, dtype=np.int64),
+            np.array(quantity, dtype=np.float64),
+            np.array(invested, dtype=np.float64)
+        )
+
+    def price_vector(self, price_map: Dict[str, float]) -> np.ndarray:
+        """Current price per factorized coin (0 for coins without a price)."""
+        return np.array([price_map.get(coin_id, 0.0) for coin_id in self.coin_ids], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.quantity)
+
+def percentage(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator * 100 where denominator > 0, else 0."""
+    out = np.zeros_like(numerator)
+    np.divide(numerator * 100, denominator, out=out, where=denominator > 0)
+    return out
+
+def valuation_kernel(columns: HoldingColumns, prices: np.ndarray) -> Dict[str, np.ndarray]:
+    """Value every holding against a price vector and reduce per user, fully vectorized."""
+    current_price = prices[columns.coin_index]
+    current_value = columns.quantity * current_price
+    profit = current_value - columns.invested
+    n_users = len(columns.user_ids)
+    user_value = np.bincount(columns.user_index, weights=current_value, minlength=n_users)
+    user_invested = np.bincount(columns.user_index, weights=columns.invested, minlength=n_users)
+    user_profit = user_value - user_invested
+    return {
+        "current_price": current_price,
+        "current_value": current_value,
+        "profit": profit,
+        "profit_percentage": percentage(profit, columns.invested),
+        "user_value": user_value,
+        "user_invested": user_invested,
+        "user_profit": user_profit,
+        "user_profit_percentage": percentage(user_profit, user_invested)
+    }
+
+class UserValuation:
+    """Materialized valuation of one user's holdings.
+
+    Positions and their current prices are updated one at a time as trades
+    and ticks arrive; the summary is rebuilt with the valuation kernel only
+    after a change and otherwise served as is.
+    """
+
+    __slots__ = ("positions", "prices", "loaded_at", "_summary")
+
+    def __init__(self, positions: List[dict], prices: Dict[str, float]):
+        self.positions: Dict[str, dict] = {position["crypto_id"]: position for position in positions}
+        self.prices: Dict[str, float] = {crypto_id: prices.get(crypto_id, 0) for crypto_id in self.positions}
+        self.loaded_at = time.monotonic()
+        self._summary: Optional[dict] = None
+
+    def set_position(self, position: Optional[dict], crypto_id: str, price: float):
+        if position is None:
+            self.positions.pop(crypto_id, None)
+            self.prices.pop(crypto_id, None)
+        else:
+            self.positions[crypto_id] = position
+            self.prices[crypto_id] = price
+        self._summary = None
+
+    def set_price(self, crypto_id: str, price: float):
+        if crypto_id in self.positions and self.prices[crypto_id] != price:
+            self.prices[crypto_id] = price
+            self._summary = None
+
+    def summary(self) -> dict:
+        if self._summary is None:
+            self._summary = self._build_summary()
+        return self._summary
+
+    def _build_summary(self) -> dict:
+        positions = list(self.positions.values())
+        if not positions:
+            return {
+                "total_value": 0,
+                "total_invested": 0,
+                "total_profit": 0,
+                "profit_percentage": 0,
+                "holdings": [],
+                "top_performers": [],
+                "top_losers": []
+            }
+        
+        columns = HoldingColumns.from_positions(positions)
+        valued = valuation_kernel(columns, columns.price_vector(self.prices))
+        current_price = valued["current_price"].tolist()
+        current_value = valued["current_value"].tolist()
+        profit = valued["profit"].tolist()
+        profit_percentage = valued["profit_percentage"].tolist()
+        holdings = [
+            {
+                "crypto_id": position["crypto_id"],
+                "crypto_name": position["crypto_name"],
+                "crypto_symbol": position["crypto_symbol"],
+                "quantity": position["quantity"],
+                "average_buy_price": position["average_buy_price"],
+                "current_price": current_price[i],
+                "total_invested": position["total_invested"],
+                "current_value": current_value[i],
+                "profit": profit[i],
+                "profit_percentage": profit_percentage[i]
+            }
+            for i, position in enumerate(positions)
+        ]
+        
+        by_profit = lambda h: h["profit_percentage"]
+        return {
+            "total_value": float(valued["user_value"][0]),
+            "total_invested": float(valued["user_invested"][0]),
+            "total_profit": float(valued["user_profit"][0]),
+            "profit_percentage": float(valued["user_profit_percentage"][0]),
+            "holdings": holdings,
+            "top_performers": heapq.nlargest(TOP_HOLDINGS, holdings, key=by_profit),
+            "top_losers": heapq.nsmallest(TOP_HOLDINGS, holdings, key=by_profit) if len(holdings) > TOP_HOLDINGS else []
+        }
+
+class PortfolioValuationEngine:
+    """Per-user portfolio summaries kept current by trades and price ticks.
+
+    Summaries for recently active users stay in memory (LRU bounded). A
+    coin -> holders index lets a price tick revalue only the users holding
+    a changed coin. Trades on this worker update the affected holding
+    directly, and VALUATION_TTL bounds staleness from other workers.
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.prices: Dict[str, float] = {}
+        self._market_list: List[Crypto] = []
+        self._users: "OrderedDict[str, UserValuation]" = OrderedDict()
+        self._holders: Dict[str, set] = {}
+        self.hits = 0
+        self.loads = 0
+        self.revaluations = 0
+
+    async def summary(self, user_id: str) -> dict:
+        valuation = self._users.get(user_id)
+        if valuation is None or time.monotonic() - valuation.loaded_at >= self.ttl:
+            valuation = await self._load(user_id)
+        else:
+            self._users.move_to_end(user_id)
+            self.hits += 1
+        return valuation.summary()
+
+    async def _load(self, user_id: str) -> UserValuation:
+        if not self.prices:
+            self.on_market_update(await get_cached_crypto_list() or [])
+        positions = await db.portfolios.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+        valuation = UserValuation(positions, self.prices)
+        self._drop(user_id)
+        self._users[user_id] = valuation
+        for crypto_id in valuation.positions:
+            self._holders.setdefault(crypto_id, set()).add(user_id)
+        while len(self._users) > self.max_users:
+            self._drop(next(iter(self._users)))
+        self.loads += 1
+        return valuation
+
+    def _drop(self, user_id: str):
+        valuation = self._users.pop(user_id, None)
+        if valuation is None:
+            return
+        for crypto_id in valuation.positions:
+            holders = self._holders.get(crypto_id)
+            if holders is not None:
+                holders.discard(user_id)
+                if not holders:
+                    del self._holders[crypto_id]
+
+    def on_market_update(self, cryptos: List[Crypto]):
+        self._market_list = cryptos
+        self._reprice(current_price_map(cryptos))
+
+    def on_catalog_update(self, catalog: MarketCatalog):
+        self._reprice(current_price_map(self._market_list))
+
+    def _reprice(self, prices: Dict[str, float]):
+        changed = {k for k, v in prices.items() if self.prices.get(k) != v}
+        changed.update(k for k in self.prices if k not in prices)
+        self.prices = prices
+        for crypto_id in changed:
+            for user_id in self._holders.get(crypto_id, ()):
+                self._users[user_id].set_price(crypto_id, prices.get(crypto_id, 0))
+                self.revaluations += 1
+
+    def apply_position(self, user_id: str, crypto_id: str, position: Optional[dict]):
+        """Reflect a trade's resulting position (None once closed) in a cached summary."""
+        valuation = self._users.get(user_id)
+        if valuation is None:
+            return
+        valuation.set_position(position, crypto_id, self.prices.get(crypto_id, 0))
+        if position is None:
+            holders = self._holders.get(crypto_id)
+            if holders is not None:
+                holders.discard(user_id)
+                if not holders:
+                    del self._holders[crypto_id]
+        else:
+            self._holders.setdefault(crypto_id, set()).add(user_id)
+
+    def invalidate(self, user_id: str):
+        self._drop(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._users),
+            "max_users": self.max_users,
+            "tracked_coins": len(self._holders),
+            "hits": self.hits,
+            "loads": self.loads,
+            "revaluations": self.revaluations
+        }
+
+valuation_engine = PortfolioValuationEngine(VALUATION_MAX_USERS, VALUATION_TTL)
+market_refresher.add_listener(valuation_engine.on_market_update)
+catalog_ingester.add_listener(valuation_engine.on_catalog_update)
+
+# Leaderboard
+LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get('LEADERBOARD_REFRESH_INTERVAL', 300))
+STARTING_BALANCE = User.model_fields["balance"].default
+
+class Leaderboard:
+    """Ranking of every user by return on the starting balance, rebuilt periodically.
+
+    One aggregation joins users with their positions, the valuation kernel
+    values them against the cached price map, and the result is kept as
+    arrays sorted by return so pages are slices and a user's rank is a
+    binary search.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.built_at: Optional[datetime] = None
+        self.build_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._names: List[str] = []
+        self._net_worth = np.zeros(0)
+        self._sorted_keys = np.zeros(0)  # -return_percentage, ascending
+        self._position: Dict[str, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def rebuild(self):
+        started = time.perf_counter()
+        prices = current_price_map(await get_cached_crypto_list() or [])
+        pipeline = [
+            {"$lookup": {"from": "portfolios", "localField": "id", "foreignField": "user_id", "as": "holdings"}},
+            {"$project": {
+                "_id": 0, "id": 1, "name": 1, "balance": 1,
+                "holdings.crypto_id": 1, "holdings.quantity": 1, "holdings.total_invested": 1
+            }}
+        ]
+        user_ids, names, balances, positions = [], [], [], []
+        async for user in db.users.aggregate(pipeline):
+            user_ids.append(user["id"])
+            names.append(user["name"])
+            balances.append(user.get("balance", STARTING_BALANCE))
+            for holding in user.get("holdings", ()):
+                holding["user_id"] = user["id"]
+                positions.append(holding)
+
+        columns = HoldingColumns.from_positions(positions, user_ids)
+        valued = valuation_kernel(columns, columns.price_vector(prices))
+        net_worth = np.array(balances, dtype=np.float64) + valued["user_value"]
+        returns = (net_worth - STARTING_BALANCE) / STARTING_BALANCE * 100
+        order = np.argsort(-returns, kind="stable")
+
+        self._names = [names[i] for i in order]
+        self._net_worth = net_worth[order]
+        self._sorted_keys = -returns[order]
+        self._position = {user_ids[i]: position for position, i in enumerate(order.tolist())}
+        self.built_at = datetime.now(timezone.utc)
+        self.build_seconds = time.perf_counter() - started
+        self.last_error = None
+
+    async def ensure_built(self):
+        if self.built_at is None:
+            async with self._lock:
+                if self.built_at is None:
+                    await self.rebuild()
+
+    def _entry(self, position: int, rank: int) -> dict:
+        return {
+            "rank": rank,
+            "name": self._names[position],
+            "net_worth": float(self._net_worth[position]),
+            "return_percentage": float(-self._sorted_keys[position])
+        }
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        keys = self._sorted_keys[offset:offset + limit]
+        # Competition ranking: tied returns share the rank of the first of them
+        ranks = (np.searchsorted(self._sorted_keys, keys, side="left") + 1).tolist()
+        return [self._entry(offset + i, rank) for i, rank in enumerate(ranks)]
+
+    def rank(self, user_id: str) -> Optional[dict]:
+        position = self._position.get(user_id)
+        if position is None:
+            return None
+        rank = int(np.searchsorted(self._sorted_keys, self._sorted_keys[position], side="left")) + 1
+        return self._entry(position, rank)
+
+    async def _run(self):
+        while True:
+            try:
+                async with self._lock:
+                    await self.rebuild()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e) or e.__class__.__name__
+                logger.warning(f"Leaderboard rebuild failed: {self.last_error}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self),
+            "interval": self.interval,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "build_seconds": self.build_seconds,
+            "last_error": self.last_error
+        }
+
+leaderboard = Leaderboard(LEADERBOARD_REFRESH_INTERVAL)
+
+# Trade Engine
+TRADE_EPSILON = 1e-9  # positions at or below this quantity are closed
+
+class TradeRejected(Exception):
+    """A trade failed validation or a guarded update (insufficient funds or holdings)."""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+def validate_trade(request: BuySellRequest):
+    if request.quantity <= 0:
+        raise TradeRejected("Quantity must be positive")
+    if request.price_per_unit <= 0:
+        raise TradeRejected("Price must be positive")
+
+def position_update(request: BuySellRequest, quantity_delta: float, invested_delta: float) -> list:
+    """Update pipeline that adds deltas to a position, creating it on upsert."""
+    return [
+        {"$set": {
+            "crypto_symbol": {"$ifNull": ["$crypto_symbol", {"$literal": request.crypto_symbol}]},
+            "crypto_name": {"$ifNull": ["$crypto_name", {"$literal": request.crypto_name}]},
+            "quantity": {"$add": [{"$ifNull": ["$quantity", 0]}, quantity_delta]},
+            "total_invested": {"$add": [{"$ifNull": ["$total_invested", 0]}, invested_delta]}
+        }},
+        {"$set": {
+            "average_buy_price": {"$cond": [
+                {"$gt": ["$quantity", TRADE_EPSILON]},
+                {"$divide": ["$total_invested", "$quantity"]},
+                {"$ifNull": ["$average_buy_price", 0]}
+            ]}
+        }}
+    ]
+
+def trade_transaction(user_id: str, request: BuySellRequest, transaction_type: str, total_amount: float) -> Transaction:
+    return Transaction(
+        user_id=user_id,
+        crypto_id=request.crypto_id,
+        crypto_symbol=request.crypto_symbol,
+        crypto_name=request.crypto_name,
+        transaction_type=transaction_type,
+        quantity=request.quantity,
+        price_per_unit=request.price_per_unit,
+        total_amount=total_amount
+    )
+
+async def execute_buy(user_id: str, request: BuySellRequest) -> float:
+    """Debit the balance and grow the position; returns the new balance.
+
+    The debit is a single conditional $inc guarded by balance >= cost, so
+    concurrent buys can never overdraw. The position upsert and transaction
+    insert then run concurrently; if the position update fails the debit is
+    refunded and the transaction removed.
+    """
+    validate_trade(request)
+    total_cost = request.quantity * request.price_per_unit
+    
+    user = await db.users.find_one_and_update(
+        {"id": user_id, "balance": {"$gte": total_cost}},
+        {"$inc": {"balance": -total_cost}},
+        projection={"_id": 0, "balance": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if user is None:
+        raise TradeRejected("Insufficient balance")
+    
+    transaction = trade_transaction(user_id, request, "buy", total_cost)
+    position_result, transaction_result = await asyncio.gather(
+        db.portfolios.find_one_and_update(
+            {"user_id": user_id, "crypto_id": request.crypto_id},
+            position_update(request, request.quantity, total_cost),
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        ),
+        db.transactions.insert_one(transaction.model_dump()),
+        return_exceptions=True
+    )
+    
+    if isinstance(position_result, Exception):
+        logger.error(f"Buy position update failed for {user_id}, refunding: {position_result}")
+        await db.users.update_one({"id": user_id}, {"$inc": {"balance": total_cost}})
+        if not isinstance(transaction_result, Exception):
+            await db.transactions.delete_one({"id": transaction.id})
+        raise position_result
+    if isinstance(transaction_result, Exception):
+        logger.error(f"Buy by {user_id} applied but transaction {transaction.id} was not recorded: {transaction_result}")
+    
+    invalidate_principal(user_id)
+    valuation_engine.apply_position(user_id, request.crypto_id, position_result)
+    return user["balance"]
+
+async def execute_sell(user_id: str, request: BuySellRequest) -> float:
+    """Shrink the position and credit the balance; returns the new balance.
+
+    The position is reduced by one guarded update (quantity >= sold, less
+    TRADE_EPSILON so float dust is sellable), which
+    also scales total_invested proportionally. If crediting the balance
+    fails the position is restored.
+    """
+    validate_trade(request)
+    total_sale = request.quantity * request.price_per_unit
+    
+    position = await db.portfolios.find_one_and_update(
+        # Within TRADE_EPSILON, so float dust from earlier trades cannot block selling everything
+        {"user_id": user_id, "crypto_id": request.crypto_id, "quantity": {"$gte": request.quantity - TRADE_EPSILON}},
+        [{"$set": {
+            "quantity": {"$subtract": ["$quantity", request.quantity]},
+            "total_invested": {"$multiply": [
+                "$total_invested",
+                {"$divide": [{"$subtract": ["$quantity", request.quantity]}, "$quantity"]}
+            ]}
+        }}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if position is None:
+        raise TradeRejected("Insufficient crypto balance")
+    invested_sold = position["total_invested"] * request.quantity / position["quantity"]
+    
+    transaction = trade_transaction(user_id, request, "sell", total_sale)
+    operations = [
+        db.users.find_one_and_update(
+            {"id": user_id},
+            {"$inc": {"balance": total_sale}},
+            projection={"_id": 0, "balance": 1},
+            return_document=ReturnDocument.AFTER
+        ),
+        db.transactions.insert_one(transaction.model_dump())
+    ]
+    if position["quantity"] - request.quantity <= TRADE_EPSILON:
+        # Remove from portfolio (guarded in case a concurrent buy re-grew it)
+        operations.append(db.portfolios.delete_one({
+            "user_id": user_id,
+            "crypto_id": request.crypto_id,
+            "quantity": {"$lte": TRADE_EPSILON}
+        }))
+    user, transaction_result, *_ = await asyncio.gather(*operations, return_exceptions=True)
+    
+    if isinstance(user, Exception) or user is None:
+        logger.error(f"Sell credit failed for {user_id}, restoring position: {user}")
+        await db.portfolios.update_one(
+            {"user_id": user_id, "crypto_id": request.crypto_id},
+            position_update(request, request.quantity, invested_sold),
+            upsert=True
+        )
+        if not isinstance(transaction_result, Exception):
+            await db.transactions.delete_one({"id": transaction.id})
+        raise user if isinstance(user, Exception) else HTTPException(status_code=401, detail="User not found")
+    if isinstance(transaction_result, Exception):
+        logger.error(f"Sell by {user_id} applied but transaction {transaction.id} was not recorded: {transaction_result}")
+    
+    invalidate_principal(user_id)
+    remaining = position["quantity"] - request.quantity
+    valuation_engine.apply_position(user_id, request.crypto_id, None if remaining <= TRADE_EPSILON else {
+        **position,
+        "quantity": remaining,
+        "total_invested": position["total_invested"] - invested_sold
+    })
+    return user["balance"]
+
+class BatchConflict(Exception):
+    """Holdings changed between the batch snapshot and its write."""
+
+def plan_batch(user_id: str, orders: List[OrderRequest], balance: float, positions: Dict[str, dict]):
+    """Validate orders in sequence against one balance and holdings snapshot.
+
+    Returns per-order results, the accepted transactions, the simulated
+    final balance and the simulated final positions.
+    """
+    positions = {crypto_id: dict(position) for crypto_id, position in positions.items()}
+    results = []
+    transactions = []
+    for index, order in enumerate(orders):
+        total_amount = order.quantity * order.price_per_unit
+        position = positions.get(order.crypto_id)
+        try:
+            validate_trade(order)
+            if order.transaction_type == "buy":
+                if total_amount > balance:
+                    raise TradeRejected("Insufficient balance")
+                balance -= total_amount
+                if position is None:
+                    position = positions[order.crypto_id] = {
+                        "crypto_symbol": order.crypto_symbol,
+                        "crypto_name": order.crypto_name,
+                        "quantity": 0.0,
+                        "total_invested": 0.0
+                    }
+                position["quantity"] += order.quantity
+                position["total_invested"] += total_amount
+            else:
+                if position is None or position["quantity"] < order.quantity - TRADE_EPSILON:
+                    raise TradeRejected("Insufficient crypto balance")
+                position["total_invested"] *= (position["quantity"] - order.quantity) / position["quantity"]
+                position["quantity"] -= order.quantity
+                balance += total_amount
+        except TradeRejected as e:
+            results.append({"index": index, "crypto_id": order.crypto_id, "transaction_type": order.transaction_type, "status": "rejected", "detail": e.detail})
+            continue
+        transaction = trade_transaction(user_id, order, order.transaction_type, total_amount)
+        transactions.append(transaction)
+        results.append({"index": index, "crypto_id": order.crypto_id, "transaction_type": order.transaction_type, "status": "filled", "transaction_id": transaction.id, "total_amount": total_amount})
+    return results, transactions, balance, positions
+
+async def apply_batch_positions(user_id: str, snapshot: Dict[str, dict], final: Dict[str, dict]) -> list:
+    """Write final positions, one guarded write per coin, all in flight at once.
+
+    Every update and delete only matches a position still equal to its
+    snapshot, and new positions are only inserted if none exists. Each
+    write reports whether it matched; if any did not, only the writes that
+    did apply are reverted and BatchConflict is raised. Otherwise returns
+    the operations that undo the writes.
+    """
+    planned = []  # (kind, filter, update, revert)
+    for crypto_id, position in final.items():
+        key = {"user_id": user_id, "crypto_id": crypto_id}
+        before = snapshot.get(crypto_id)
+        closed = position["quantity"] <= TRADE_EPSILON
+        if before is not None:
+            if before["quantity"] == position["quantity"] and before["total_invested"] == position["total_invested"]:
+                continue
+            guard = {**key, "quantity": before["quantity"], "total_invested": before["total_invested"]}
+            if closed:
+                planned.append(("delete", guard, None, UpdateOne(key, {"$setOnInsert": before}, upsert=True)))
+            else:
+                values = {
+                    "quantity": position["quantity"],
+                    "total_invested": position["total_invested"],
+                    "average_buy_price": position["total_invested"] / position["quantity"]
+                }
+                planned.append(("update", guard, {"$set": values}, UpdateOne({**key, "quantity": values["quantity"], "total_invested": values["total_invested"]}, {"$set": {
+                    "quantity": before["quantity"],
+                    "total_invested": before["total_invested"],
+                    "average_buy_price": before["average_buy_price"]
+                }})))
+        elif not closed:
+            planned.append(("insert", key, {"$setOnInsert": Portfolio(
+                user_id=user_id,
+                crypto_id=crypto_id,
+                crypto_symbol=position["crypto_symbol"],
+                crypto_name=position["crypto_name"],
+                quantity=position["quantity"],
+                average_buy_price=position["total_invested"] / position["quantity"],
+                total_invested=position["total_invested"]
+            ).model_dump()}, None))
+    
+    async def write(kind: str, query: dict, update: Optional[dict], revert):
+        """Apply one planned write; returns its revert, or None if its guard missed."""
+        if kind == "delete":
+            deleted = (await db.portfolios.delete_one(query)).deleted_count == 1
+            return revert if deleted else None
+        result = await db.portfolios.update_one(query, update, upsert=kind == "insert")
+        if kind == "insert":
+            return DeleteOne({"_id": result.upserted_id}) if result.upserted_id is not None else None
+        return revert if result.matched_count == 1 else None
+    
+    outcomes = await asyncio.gather(*(write(*write_plan) for write_plan in planned), return_exceptions=True)
+    failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    reverts = [outcome for outcome in outcomes if outcome is not None and not isinstance(outcome, Exception)]
+    if len(reverts) == len(planned):
+        return reverts
+    
+    # Undo only what applied: restoring a delete that never happened would resurrect a sold position
+    if reverts:
+        await db.portfolios.bulk_write(reverts, ordered=False)
+    if failures:
+        raise failures[0]
+    raise BatchConflict()
+
+async def execute_batch(user_id: str, orders: List[OrderRequest]) -> dict:
+    """Validate and apply many orders with a handful of database operations."""
+    crypto_ids = list({order.crypto_id for order in orders})
+    user, holdings = await asyncio.gather(
+        db.users.find_one({"id": user_id}, {"_id": 0, "balance": 1}),
+        db.portfolios.find({"user_id": user_id, "crypto_id": {"$in": crypto_ids}}, {"_id": 0}).to_list(len(crypto_ids))
+    )
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    snapshot = {holding["crypto_id"]: holding for holding in holdings}
+    
+    results, transactions, final_balance, final_positions = plan_batch(user_id, orders, user["balance"], snapshot)
+    if not transactions:
+        return {"results": results, "filled": 0, "rejected": len(results), "new_balance": user["balance"]}
+    
+    # Reserve net spending up front; net proceeds are only credited after the positions are written
+    balance_delta = final_balance - user["balance"]
+    if balance_delta < 0:
+        debited = await db.users.find_one_and_update(
+            {"id": user_id, "balance": {"$gte": -balance_delta}},
+            {"$inc": {"balance": balance_delta}}
+        )
+        if debited is None:
+            raise HTTPException(status_code=409, detail="Balance changed while processing orders, please retry")
+    
+    try:
+        reverts = await apply_batch_positions(user_id, snapshot, final_positions)
+    except BaseException as e:
+        if balance_delta < 0:
+            await db.users.update_one({"id": user_id}, {"$inc": {"balance": -balance_delta}})
+        if isinstance(e, BatchConflict):
+            raise HTTPException(status_code=409, detail="Portfolio changed while processing orders, please retry")
+        raise
+    
+    operations = [db.transactions.insert_many([t.model_dump() for t in transactions], ordered=False)]
+    if balance_delta > 0:
+        operations.append(db.users.update_one({"id": user_id}, {"$inc": {"balance": balance_delta}}))
+    outcomes = await asyncio.gather(*operations, return_exceptions=True)
+    credit = outcomes[1] if len(outcomes) > 1 else None
+    if isinstance(credit, Exception) or (credit is not None and credit.matched_count == 0):
+        logger.error(f"Batch credit failed for {user_id}, restoring positions: {credit}")
+        if reverts:
+            await db.portfolios.bulk_write(reverts, ordered=False)
+        # insert_many is unordered, so some transactions may exist even if it failed
+        await db.transactions.delete_many({"id": {"$in": [t.id for t in transactions]}})
+        raise credit if isinstance(credit, Exception) else HTTPException(status_code=401, detail="User not found")
+    if isinstance(outcomes[0], Exception):
+        logger.error(f"Batch by {user_id} applied but transactions were not fully recorded: {outcomes[0]}")
+    
+    invalidate_principal(user_id)
+    valuation_engine.invalidate(user_id)
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "balance": 1})
+    return {
+        "results": results,
+        "filled": len(transactions),
+        "rejected": len(results) - len(transactions),
+        "new_balance": user["balance"]
+    }
+
+# Portfolio Routes
+@api_router.post("/portfolio/buy")
+async def buy_crypto(request: BuySellRequest, current_user: dict = Depends(get_token_principal)):
+    try:
+        new_balance = await execute_buy(current_user["id"], request)
+    except TradeRejected as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    return {"message": "Purchase successful", "new_balance": new_balance}
+
+@api_router.post("/portfolio/sell")
+async def sell_crypto(request: BuySellRequest, current_user: dict = Depends(get_token_principal)):
+    try:
+        new_balance = await execute_sell(current_user["id"], request)
+    except TradeRejected as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    return {"message": "Sale successful", "new_balance": new_balance}
+
+@api_router.post("/portfolio/orders")
+async def place_orders(request: BatchOrderRequest, current_user: dict = Depends(get_token_principal)):
+    """Execute a batch of buy/sell orders in sequence against one balance and holdings snapshot"""
+    return await execute_batch(current_user["id"], request.orders)
+
+@api_router.get("/portfolio")
+async def get_portfolio(current_user: dict = Depends(get_token_principal)):
+    portfolios = await db.portfolios.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
+    return portfolios
+
+@api_router.get("/portfolio/summary")
+async def get_portfolio_summary(current_user: dict = Depends(get_token_principal)):
+    """Get portfolio summary with current values and performance.
+
+    stale is true while prices come from last-known-good market data.
+    """
+    summary = await valuation_engine.summary(current_user["id"])
+    as_of = market_refresher.data_as_of
+    return {**summary, "stale": market_refresher.is_stale(), "prices_as_of": as_of.isoformat() if as_of else None}
+
+@api_router.get("/leaderboard")
+async def get_leaderboard(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_token_principal)
+):
+    """Users ranked by return on the starting balance, plus the caller's own rank"""
+    await leaderboard.ensure_built()
+    return {
+        "updated_at": leaderboard.built_at.isoformat(),
+        "total": len(leaderboard),
+        "offset": offset,
+        "limit": limit,
+        "entries": leaderboard.page(offset, limit),
+        "me": leaderboard.rank(current_user["id"])
+    }
+
+TRANSACTION_SORT = [("timestamp", DESCENDING), ("id", DESCENDING)]
+TRANSACTION_STREAM_BATCH = 500  # documents per cursor batch when streaming
+
+def encode_transaction_cursor(transaction: dict) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([transaction["timestamp"], transaction["id"]])).decode()
+
+def decode_transaction_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, transaction_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(timestamp), str(transaction_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def transactions_before(user_id: str, before: Optional[str]) -> dict:
+    """Keyset filter for one user's transactions older than the cursor position."""
+    query = {"user_id": user_id}
+    if before:
+        timestamp, transaction_id = decode_transaction_cursor(before)
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": transaction_id}}
+        ]
+    return query
+
+async def stream_ndjson(cursor):
+    async for document in cursor:
+        yield orjson.dumps(document) + b"\n"
+
+@api_router.get("/transactions")
+async def get_transactions(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    before: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    current_user: dict = Depends(get_token_principal)
+):
+    """Newest-first transaction history, paginated by an opaque (timestamp, id) cursor.
+
+    JSON responses return one page and put the cursor for the next page in
+    the X-Next-Cursor header. format=ndjson streams every remaining
+    transaction (limit is ignored) as the database cursor yields them.
+    """
+    query = transactions_before(current_user["id"], before)
+    
+    if format == "ndjson":
+        cursor = db.transactions.find(query, {"_id": 0}).sort(TRANSACTION_SORT).batch_size(TRANSACTION_STREAM_BATCH)
+        return StreamingResponse(stream_ndjson(cursor), media_type="application/x-ndjson")
+    
+    transactions = await db.transactions.find(query, {"_id": 0}).sort(TRANSACTION_SORT).limit(limit + 1).to_list(limit + 1)
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        response.headers["X-Next-Cursor"] = encode_transaction_cursor(transactions[-1])
+    return transactions
+
+EXPORT_FIELDS = ["id", "timestamp", "transaction_type", "crypto_id", "crypto_symbol", "crypto_name", "quantity", "price_per_unit", "total_amount"]
+EXPORT_BATCH_SIZE = 5000  # rows buffered per CSV chunk / Parquet row group
+
+def parse_export_bound(value: str, end: bool = False) -> str:
+    """Turn a date or datetime query value into an ISO bound comparable with stored timestamps."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end and "T" not in value:
+        # A bare end date includes that whole day
+        parsed += timedelta(days=1)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+def export_query(user_id: str, start: Optional[str], end: Optional[str], crypto_id: Optional[str]) -> dict:
+    query = {"user_id": user_id}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = parse_export_bound(start)
+        if end:
+            query["timestamp"]["$lt"] = parse_export_bound(end, end=True)
+    if crypto_id:
+        query["crypto_id"] = crypto_id
+    return query
+
+def export_cursor(query: dict):
+    projection = {field: 1 for field in EXPORT_FIELDS}
+    projection["_id"] = 0
+    return db.transactions.find(query, projection).sort([("timestamp", ASCENDING), ("id", ASCENDING)]).batch_size(EXPORT_BATCH_SIZE)
+
+async def export_batches(cursor):
+    """Yield lists of at most EXPORT_BATCH_SIZE documents from a cursor."""
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def stream_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    async for batch in export_batches(cursor):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain.
+
+    tell() keeps counting across drains so the Parquet footer offsets stay right.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def stream_parquet(cursor):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("timestamp", pa.string()),
+        ("transaction_type", pa.string()),
+        ("crypto_id", pa.string()),
+        ("crypto_symbol", pa.string()),
+        ("crypto_name", pa.string()),
+        ("quantity", pa.float64()),
+        ("price_per_unit", pa.float64()),
+        ("total_amount", pa.float64())
+    ])
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    try:
+        async for batch in export_batches(cursor):
+            # One row group per batch
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+@api_router.get("/transactions/export")
+async def export_transactions(
+    format: Literal["csv", "parquet"] = "csv",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    crypto_id: Optional[str] = None,
+    current_user: dict = Depends(get_token_principal)
+):
+    """Stream the caller's full transaction history, oldest first, as CSV or Parquet"""
+    query = export_query(current_user["id"], start, end, crypto_id)
+    filename = f"transactions-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "parquet":
+        return StreamingResponse(stream_parquet(export_cursor(query)), media_type="application/vnd.apache.parquet", headers=headers)
+    return StreamingResponse(stream_csv(export_cursor(query)), media_type="text/csv", headers=headers)
+
+@api_router.get("/status")
+async def get_status():
+    """Operational status of background market data components"""
+    return {
+        "market_refresher": market_refresher.status(),
+        "password_pool": password_pool.stats(),
+        "price_stream": price_broadcaster.stats(),
+        "valuation": valuation_engine.stats(),
+        "leaderboard": leaderboard.stats(),
+        "catalog": catalog_ingester.stats(),
+        "upstream_limiter": upstream_limiter.stats(),
+        "catalog_limiter": catalog_limiter.stats(),
+        "upstream_breaker": upstream_breaker.stats(),
+        "upstream_singleflight": upstream_flights.stats(),
+        "caches": {
+            "market": market_store.stats(),
+            "market_search": market_search_cache.stats(),
+            "detail_payload": detail_payload_cache.stats(),
+            "chart": chart_store.stats(),
+            "quote": quote_store.stats(),
+            "principal": principal_cache.stats()
+        },
+        "candles": candle_store.stats(),
+        "downsample": downsample_cache.stats()
+    }
+
+# Include router
+app.include_router(api_router)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_credentials=True,
+    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Stale", "X-Data-Age"],
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def start_http_client():
+    get_http_client()
+
+@app.on_event("startup")
+async def start_market_refresher():
+    await market_refresher.restore()
+    market_refresher.start()
+
+@app.on_event("startup")
+async def start_leaderboard():
+    leaderboard.start()
+
+@app.on_event("startup")
+async def start_catalog_ingester():
+    catalog_ingester.start()
+
+@app.on_event("shutdown")
+async def stop_market_refresher():
+    await market_refresher.stop()
+
+@app.on_event("shutdown")
+async def stop_leaderboard():
+    await leaderboard.stop()
+
+@app.on_event("shutdown")
+async def stop_catalog_ingester():
+    await catalog_ingester.stop()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    if http_client is not None:
+        await http_client.aclose()
+
+@app.on_event("shutdown")
+async def shutdown_cache_backend():
+    await cache_backend.close()
+
+@app.on_event("shutdown")
+async def shutdown_password_pool():
+    password_pool.shutdown()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
@@ -0,0 +1,37 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Import server.py from the backend directory against a throwaway database
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("TEST_DB_NAME", "crypto_trading_test")
+
+
+def run_with_db(fn):
+    """Run fn() on a fresh event loop with server.db on a Motor client made for that loop.
+
+    The module-level client binds to the first loop that uses it, so each
+    asyncio.run() needs a client of its own.
+    """
+    import server
+
+    async def scenario():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        original, server.db = server.db, client[os.environ["DB_NAME"]]
+        try:
+            return await fn()
+        finally:
+            server.db = original
+            client.close()
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(scope="session")
+def run_db():
+    return run_with_db
@@ -0,0 +1,121 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+from pymongo import MongoClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import server
+
+USER_ID = "batch-user"
+
+
+def order(transaction_type, crypto_id, quantity, price):
+    return server.OrderRequest(
+        transaction_type=transaction_type,
+        crypto_id=crypto_id,
+        crypto_symbol=crypto_id.upper(),
+        crypto_name=crypto_id.title(),
+        quantity=quantity,
+        price_per_unit=price
+    )
+
+
+def test_plan_batch_rejects_and_continues():
+    orders = [
+        order("buy", "btc", 1, 100),
+        order("sell", "eth", 1, 10),
+        order("buy", "btc", 100, 100),
+        order("sell", "btc", 0.5, 120)
+    ]
+    results, transactions, balance, positions = server.plan_batch(USER_ID, orders, 1000.0, {})
+    assert [r["status"] for r in results] == ["filled", "rejected", "rejected", "filled"]
+    assert results[1]["detail"] == "Insufficient crypto balance"
+    assert results[2]["detail"] == "Insufficient balance"
+    assert len(transactions) == 2
+    assert balance == 1000 - 100 + 60
+    assert positions["btc"]["quantity"] == 0.5
+    assert positions["btc"]["total_invested"] == 50
+
+
+@pytest.fixture
+def test_db():
+    mongo = MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=2000)
+    try:
+        mongo.admin.command("ping")
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not reachable")
+    database = mongo[os.environ["DB_NAME"]]
+    database.users.delete_many({"id": USER_ID})
+    database.portfolios.delete_many({"user_id": USER_ID})
+    database.transactions.delete_many({"user_id": USER_ID})
+    database.users.insert_one({"id": USER_ID, "balance": 1000.0})
+    database.portfolios.insert_one({
+        "user_id": USER_ID, "crypto_id": "btc", "crypto_symbol": "BTC", "crypto_name": "Btc",
+        "quantity": 2.0, "average_buy_price": 50.0, "total_invested": 100.0
+    })
+    yield database
+    database.users.delete_many({"id": USER_ID})
+    database.portfolios.delete_many({"user_id": USER_ID})
+    database.transactions.delete_many({"user_id": USER_ID})
+    mongo.close()
+
+
+def holdings(database):
+    return {p["crypto_id"]: p["quantity"] for p in database.portfolios.find({"user_id": USER_ID})}
+
+
+def test_partial_reject_applies_only_filled_orders(test_db, run_db):
+    orders = [order("sell", "btc", 1, 80), order("sell", "eth", 1, 10), order("buy", "eth", 2, 100)]
+    outcome = run_db(lambda: server.execute_batch(USER_ID, orders))
+    assert (outcome["filled"], outcome["rejected"]) == (2, 1)
+    assert outcome["new_balance"] == 1000 + 80 - 200
+    assert holdings(test_db) == {"btc": 1.0, "eth": 2.0}
+    assert test_db.transactions.count_documents({"user_id": USER_ID}) == 2
+
+
+def test_conflict_between_plan_and_apply_restores_everything(test_db, run_db, monkeypatch):
+    plan = server.plan_batch
+
+    def plan_then_trade_elsewhere(*args):
+        planned = plan(*args)
+        # Another request sells part of the position after the snapshot was read
+        test_db.portfolios.update_one({"user_id": USER_ID, "crypto_id": "btc"}, {"$set": {"quantity": 1.5}})
+        return planned
+
+    monkeypatch.setattr(server, "plan_batch", plan_then_trade_elsewhere)
+    orders = [order("buy", "eth", 1, 100), order("sell", "btc", 1, 80)]
+    with pytest.raises(HTTPException) as conflict:
+        run_db(lambda: server.execute_batch(USER_ID, orders))
+    assert conflict.value.status_code == 409
+    # The new eth position is reverted and the reserved spending refunded
+    assert holdings(test_db) == {"btc": 1.5}
+    assert test_db.users.find_one({"id": USER_ID})["balance"] == 1000.0
+    assert test_db.transactions.count_documents({"user_id": USER_ID}) == 0
+
+
+def test_plan_batch_sells_float_dust():
+    # Ten buys of 0.02 sum to 0.19999999999999998
+    orders = [order("buy", "btc", 0.02, 100) for _ in range(10)] + [order("sell", "btc", 0.02, 100) for _ in range(10)]
+    results, transactions, balance, positions = server.plan_batch(USER_ID, orders, 1000.0, {})
+    assert all(r["status"] == "filled" for r in results)
+    assert positions["btc"]["quantity"] <= server.TRADE_EPSILON
+
+
+def test_conflict_does_not_restore_a_position_sold_elsewhere(test_db, run_db, monkeypatch):
+    plan = server.plan_batch
+
+    def plan_then_sell_elsewhere(*args):
+        planned = plan(*args)
+        # Another request sells the whole position after the snapshot was read
+        test_db.portfolios.delete_one({"user_id": USER_ID, "crypto_id": "btc"})
+        return planned
+
+    monkeypatch.setattr(server, "plan_batch", plan_then_sell_elsewhere)
+    orders = [order("buy", "eth", 1, 100), order("sell", "btc", 2, 80)]
+    with pytest.raises(HTTPException) as conflict:
+        run_db(lambda: server.execute_batch(USER_ID, orders))
+    assert conflict.value.status_code == 409
+    # Neither the eth insert nor the btc delete that never happened leaves a trace
+    assert holdings(test_db) == {}
+    assert test_db.users.find_one({"id": USER_ID})["balance"] == 1000.0
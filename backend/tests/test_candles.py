@@ -0,0 +1,24 @@
+import server
+
+
+def test_rollup_groups_points_into_buckets():
+    points = [[0, 10.0], [60_000, 12.0], [120_000, 9.0], [300_000, 11.0], [360_000, 13.0]]
+    assert server.rollup_candles(points, 300_000) == [
+        {"t": 0, "o": 10.0, "h": 12.0, "l": 9.0, "c": 9.0},
+        {"t": 300_000, "o": 11.0, "h": 13.0, "l": 11.0, "c": 13.0},
+    ]
+
+
+def test_rollup_aligns_buckets_to_resolution():
+    candles = server.rollup_candles([[3_599_999, 1.0], [3_600_000, 2.0], [3_600_001, 3.0]], 3_600_000)
+    assert [candle["t"] for candle in candles] == [0, 3_600_000]
+    assert candles[1]["o"] == 2.0 and candles[1]["c"] == 3.0
+
+
+def test_rollup_empty():
+    assert server.rollup_candles([], 300_000) == []
+
+
+def test_every_chart_range_has_a_resolution():
+    assert set(server.CHART_RESOLUTION) == set(server.CANONICAL_CHART_DAYS)
+    assert set(server.CHART_RESOLUTION.values()) <= set(server.CANDLE_RESOLUTIONS)
@@ -0,0 +1,56 @@
+import orjson
+
+import server
+
+
+ITEMS = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "image": "b.png", "current_price": 50000.0,
+     "price_change_24h": 10.0, "price_change_percentage_24h": 0.1, "market_cap": 1e12, "market_cap_rank": 1, "total_volume": 1e9},
+    {"id": "dust", "symbol": "dst", "name": "Dust", "image": None, "current_price": None,
+     "price_change_24h": None, "price_change_percentage_24h": None, "market_cap": None, "market_cap_rank": None, "total_volume": None},
+]
+
+
+def test_catalog_row_zeroes_nulls():
+    row = server.catalog_row(ITEMS[1])
+    assert row["symbol"] == "DST"
+    assert row["image"] == ""
+    assert row["current_price"] == 0 and row["market_cap_rank"] == 0
+
+
+def test_catalog_rows_round_trip_through_columns():
+    rows = [server.catalog_row(item) for item in ITEMS]
+    catalog = server.MarketCatalog.from_rows(rows)
+    assert len(catalog) == 2
+    assert catalog.get("bitcoin") == rows[0]
+    assert catalog.get("missing") is None
+    assert catalog.price_map == {"bitcoin": 50000.0, "dust": 0.0}
+    
+    restored = server.MarketCatalog(catalog.columns())
+    assert [restored.row(i) for i in range(len(restored))] == rows
+    # Rows validate as the Crypto model the list endpoint documents
+    server.Crypto(**restored.row(1))
+
+
+def test_catalog_search_ranks_unranked_last():
+    catalog = server.MarketCatalog.from_rows([server.catalog_row(item) for item in reversed(ITEMS)])
+    assert [catalog.ids[i] for i in catalog.index.search("t")] == ["bitcoin", "dust"]
+
+
+def test_catalog_search_is_limited():
+    payload = server.MarketPayload(server.TTLCache("test_search", max_entries=8, max_bytes=1024 * 1024, ttl=60, sizer=lambda p: p.size()))
+    payload.set_catalog(server.MarketCatalog.from_rows([server.catalog_row(item) for item in ITEMS]))
+    assert [coin["id"] for coin in orjson.loads(payload.search([], "t", limit=1).body)] == ["bitcoin"]
+    assert len(orjson.loads(payload.search([], "t", limit=2).body)) == 2
+
+
+def test_price_stream_covers_catalog_coins():
+    broadcaster = server.PriceBroadcaster()
+    client = broadcaster.subscribe(frozenset({"dust"}))
+    everything = broadcaster.subscribe(None)
+    broadcaster.set_catalog(server.MarketCatalog.from_rows([server.catalog_row(item) for item in ITEMS]))
+    assert b'"dust"' in broadcaster.snapshot(client.ids)
+    assert b'"dust"' in client.queue.get_nowait()
+    # The unfiltered stream stays on the market list
+    assert everything.queue.empty()
+    assert broadcaster.snapshot(None).count(b"dust") == 0
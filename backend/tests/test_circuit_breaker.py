@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+
+
+def test_opens_after_threshold_and_fails_fast():
+    breaker = server.CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(server.CircuitOpen):
+        breaker.before_call()
+    # Callers that fall back on upstream trouble catch this too
+    assert issubclass(server.CircuitOpen, server.UpstreamUnavailable)
+
+
+def test_half_open_allows_one_trial():
+    breaker = server.CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.before_call()
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN
+    with pytest.raises(server.CircuitOpen):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_trial_reopens():
+    breaker = server.CircuitBreaker("test", failure_threshold=3, reset_timeout=0.01)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.is_open
+
+
+def test_released_trial_can_be_retried():
+    breaker = server.CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+
+
+def test_before_call_reports_the_trial_slot():
+    breaker = server.CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    assert breaker.before_call() is False
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.before_call() is True
+    # Only that caller may release(); everyone else is still turned away
+    with pytest.raises(server.CircuitOpen):
+        breaker.before_call()
+
+
+def test_coingecko_get_rechecks_breaker_after_waiting_for_budget(monkeypatch):
+    breaker = server.CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    monkeypatch.setattr(server, "upstream_breaker", breaker)
+    bucket = server.TokenBucket(rate=20, capacity=1)
+    bucket.tokens = 0.0
+
+    async def scenario():
+        call = asyncio.create_task(server.coingecko_get("/ping", max_wait=None, limiter=bucket))
+        await asyncio.sleep(0)
+        # The upstream is marked down while the call queues for a token
+        breaker.record_failure()
+        with pytest.raises(server.CircuitOpen):
+            await call
+
+    asyncio.run(scenario())
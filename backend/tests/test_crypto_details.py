@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+DELAY = 0.05
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def api(monkeypatch, events):
+    cryptos = [
+        server.Crypto(
+            id="listed", symbol="LST", name="Listed", image="", current_price=2.0,
+            price_change_24h=0.0, price_change_percentage_24h=0.0, market_cap=1e6,
+            market_cap_rank=1, total_volume=1e3
+        )
+    ]
+    server.market_cache.set("crypto_list", cryptos)
+
+    async def fetch_quote(crypto_id):
+        events.append("quote started")
+        await asyncio.sleep(DELAY)
+        events.append("quote finished")
+        quote = {"id": crypto_id, "symbol": "oth", "name": "Other", "current_price": 1.0} if crypto_id != "missing" else None
+        return {"quote": quote, "as_of": "2026-01-01T00:00:00+00:00"}
+
+    async def candles(coin, days):
+        events.append("chart started")
+        await asyncio.sleep(DELAY)
+        events.append("chart finished")
+        return {"resolution": "5m", "candles": [{"t": 1000, "o": 1.0, "h": 2.0, "l": 0.5, "c": 1.5}], "synced": True}
+
+    monkeypatch.setattr(server, "fetch_quote", fetch_quote)
+    monkeypatch.setattr(server.candle_store, "candles", candles)
+    yield TestClient(server.app)
+    for cache in (server.market_cache, server.quote_cache, server.chart_cache, server.detail_payload_cache):
+        cache.clear()
+
+
+def test_quote_and_chart_fetched_concurrently(api, events):
+    response = api.get("/api/cryptos/other?days=1")
+    assert response.status_code == 200
+    # Both parts were in flight before either finished
+    assert sorted(events[:2]) == ["chart started", "quote started"]
+    body = response.json()
+    assert body["crypto"]["id"] == "other"
+    assert body["chart"] == [[1000, 1.5]]
+    assert body["freshness"]["quote"] == {"source": "upstream", "as_of": "2026-01-01T00:00:00+00:00", "stale": False}
+    assert body["freshness"]["chart"]["stale"] is False
+
+
+def test_market_list_quote_needs_no_upstream_call(api):
+    body = api.get("/api/cryptos/listed?days=1").json()
+    assert body["crypto"]["symbol"] == "LST"
+    assert body["freshness"]["quote"]["source"] == "market_list"
+    assert "crypto_quote_listed" not in server.quote_cache
+
+
+def test_chart_failure_serves_quote(api, monkeypatch):
+    async def failing(coin, days):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(server.candle_store, "candles", failing)
+    response = api.get("/api/cryptos/other?days=1")
+    assert response.status_code == 200
+    assert response.headers["x-stale"] == "true"
+    body = response.json()
+    assert body["crypto"]["id"] == "other"
+    assert body["chart"] == []
+    assert body["freshness"]["chart"]["error"] == "unavailable"
+
+
+def test_unknown_coin_is_404(api):
+    assert api.get("/api/cryptos/missing?days=1").status_code == 404
+
+
+def test_quote_failure_serves_chart(api, monkeypatch):
+    async def failing(crypto_id):
+        raise server.UpstreamRateLimited("budget exhausted")
+
+    monkeypatch.setattr(server, "fetch_quote", failing)
+    body = api.get("/api/cryptos/other?days=1").json()
+    assert body["crypto"] is None
+    assert body["chart"] == [[1000, 1.5]]
+    assert body["freshness"]["quote"]["error"] == "unavailable"
+
+
+def test_quotes_share_one_schema():
+    upstream = server.normalize_quote({
+        "id": "other", "symbol": "oth", "name": "Other", "image": "o.png", "current_price": 1.0,
+        "price_change_24h": None, "market_cap": 5.0, "market_cap_rank": 900, "total_volume": 2.0,
+        "roi": None, "ath": 3.0
+    })
+    catalog = server.normalize_quote(server.catalog_row({"id": "dust", "symbol": "dst", "name": "Dust"}), zero_is_missing=True)
+    assert list(upstream) == list(catalog) == list(server.Crypto.model_fields)
+    assert upstream["symbol"] == "OTH"
+    assert upstream["price_change_24h"] is None and upstream["price_change_percentage_24h"] is None
+    assert catalog["current_price"] is None and catalog["market_cap_rank"] is None and catalog["image"] is None
@@ -0,0 +1,41 @@
+import numpy as np
+
+import server
+
+
+def test_lttb_keeps_endpoints_and_size():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    indices = server.lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[321] = 100.0
+    assert 321 in server.lttb_indices(x, y, 20)
+
+
+def test_lttb_short_series_untouched():
+    x = np.arange(10, dtype=float)
+    assert server.lttb_indices(x, x, 50).tolist() == list(range(10))
+
+
+def test_normalize_points_rounds_down_to_allowed_size():
+    assert server.normalize_points(50) == 50
+    assert server.normalize_points(750) == 500
+    assert server.normalize_points(10_000) == server.CHART_POINT_STEPS[-1]
+
+
+def test_downsample_chart_is_cached_until_source_changes():
+    chart = [[i * 1000, float(i % 7)] for i in range(400)]
+    result = {"crypto": {"id": "test"}, "chart": chart, "candles": [[t, p, p, p, p] for t, p in chart]}
+    first = server.downsample_chart("test_downsample", result, 100)
+    assert len(first["chart"]) == len(first["candles"]) == 100
+    assert server.downsample_chart("test_downsample", result, 100)["chart"] is first["chart"]
+    
+    updated = {**result, "chart": chart + [[400_000, 3.0]], "candles": result["candles"] + [[400_000, 3.0, 3.0, 3.0, 3.0]]}
+    assert server.downsample_chart("test_downsample", updated, 100)["chart"][-1] == [400_000, 3.0]
@@ -0,0 +1,76 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def api():
+    cryptos = [
+        server.Crypto(
+            id=f"coin-{i}", symbol=f"c{i}", name=f"Coin {i}", image="", current_price=float(i),
+            price_change_24h=0.0, price_change_percentage_24h=0.0, market_cap=1e6,
+            market_cap_rank=i + 1, total_volume=1e3
+        )
+        for i in range(50)
+    ]
+    server.market_cache.set("crypto_list", cryptos)
+    yield TestClient(server.app)
+    server.market_cache.delete("crypto_list")
+
+
+def test_etag_revalidation_returns_304(api):
+    first = api.get("/api/cryptos")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    
+    second = api.get("/api/cryptos", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert api.get("/api/cryptos", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize("encoding,decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+def test_negotiated_compression(api, encoding, decompress):
+    plain = api.get("/api/cryptos", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    response = api.get("/api/cryptos", headers={"Accept-Encoding": encoding})
+    assert response.headers["content-encoding"] == encoding
+    # A different content-coding is a different representation with its own strong ETag
+    assert response.headers["etag"] == plain.headers["etag"][:-1] + f'-{encoding}"'
+    assert api.get("/api/cryptos", headers={"Accept-Encoding": encoding, "If-None-Match": plain.headers["etag"]}).status_code == 200
+    assert api.get("/api/cryptos", headers={"Accept-Encoding": encoding, "If-None-Match": response.headers["etag"]}).status_code == 304
+    # The test client does not decode br, so check the raw bytes
+    assert decompress(server.market_payload.full(server.market_cache.get("crypto_list")).compressed(encoding)) == plain.content
+
+
+def test_negotiate_encoding():
+    assert server.negotiate_encoding("gzip, deflate, br") == "br"
+    assert server.negotiate_encoding("gzip, br;q=0") == "gzip"
+    assert server.negotiate_encoding("identity") is None
+    assert server.negotiate_encoding("") is None
+
+
+def test_compressed_once_per_payload():
+    payload = server.EncodedPayload(b"[" + b"1," * 1000 + b"1]")
+    assert payload.compressed("gzip") is payload.compressed("gzip")
+
+
+def test_remaining_lifetime_survives_l2_fill():
+    store = server.TieredCache(server.TTLCache("test_fill", max_entries=4, max_bytes=1024, ttl=60), server.NullCacheBackend(), "test:")
+    # A copy read from the shared cache 50 s into its 60 s TTL
+    store._fill_l1("key", [1], age=50, ttl=60)
+    assert store.l1.age("key") < 1
+    assert 9 <= store.l1.remaining("key") <= 10
+
+
+def test_payload_size_covers_lazily_compressed_variants():
+    payload = server.EncodedPayload(b"[" + b"1," * 1000 + b"1]")
+    reserved = payload.size()
+    for encoding in server.COMPRESSORS:
+        payload.compressed(encoding)
+    assert len(payload.body) + sum(len(payload.compressed(e)) for e in server.COMPRESSORS) <= reserved
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+import server
+
+
+@pytest.fixture(scope="module")
+def test_db(run_db):
+    mongo = MongoClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=2000)
+    try:
+        mongo.admin.command("ping")
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not reachable")
+    mongo.drop_database(os.environ["DB_NAME"])
+    run_db(server.ensure_indexes)
+    database = mongo[os.environ["DB_NAME"]]
+    # A few documents so the planner has something to choose between
+    database.users.insert_many([{"id": f"user-{i}", "email": f"user{i}@example.com"} for i in range(20)])
+    database.portfolios.insert_many([
+        {"user_id": f"user-{i % 20}", "crypto_id": f"coin-{i}"} for i in range(100)
+    ])
+    database.transactions.insert_many([
+        {"user_id": f"user-{i % 20}", "timestamp": f"2025-01-01T00:00:{i % 60:02d}", "id": f"tx-{i}"} for i in range(200)
+    ])
+    yield database
+    mongo.drop_database(os.environ["DB_NAME"])
+    mongo.close()
+
+
+def plan_stages(plan):
+    """Collect every stage name in an explain() winning plan."""
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages += plan_stages(value)
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in plan_stages(item)]
+    return []
+
+
+def winning_stages(cursor):
+    return plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+
+
+@pytest.mark.parametrize("collection,query", [
+    ("users", {"email": "user3@example.com"}),
+    ("users", {"id": "user-3"}),
+    ("portfolios", {"user_id": "user-3"}),
+    ("portfolios", {"user_id": "user-3", "crypto_id": "coin-3"}),
+])
+def test_lookup_uses_index(test_db, collection, query):
+    stages = winning_stages(test_db[collection].find(query))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+
+
+def test_transaction_history_uses_index_for_filter_and_sort(test_db):
+    stages = winning_stages(test_db.transactions.find({"user_id": "user-3"}).sort([("timestamp", -1), ("id", -1)]))
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
+
+
+def test_unique_indexes_reject_duplicates(test_db):
+    with pytest.raises(DuplicateKeyError):
+        test_db.users.insert_one({"id": "user-new", "email": "user3@example.com"})
+    with pytest.raises(DuplicateKeyError):
+        test_db.portfolios.insert_one({"user_id": "user-3", "crypto_id": "coin-3"})
+
+
+def test_transaction_keyset_page_uses_index(test_db):
+    cursor = server.encode_transaction_cursor({"timestamp": "2025-01-01T00:00:30", "id": "tx-50"})
+    query = server.transactions_before("user-3", cursor)
+    stages = winning_stages(test_db.transactions.find(query).sort(server.TRANSACTION_SORT).limit(10))
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
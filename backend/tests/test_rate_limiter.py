@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+
+
+def test_unbounded_waiter_does_not_block_bounded_caller():
+    async def scenario():
+        bucket = server.TokenBucket(rate=10, capacity=1)
+        bucket.backoff(3)
+        unbounded = asyncio.create_task(bucket.acquire(None))
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        assert await bucket.acquire(0.5) is False
+        rejected_after = time.monotonic() - started
+        unbounded.cancel()
+        return rejected_after, bucket
+
+    rejected_after, bucket = asyncio.run(scenario())
+    assert rejected_after < 0.1
+    assert bucket.rejections == 1
+    # The cancelled reservation was handed back
+    assert bucket.tokens == 0
+
+
+def test_reservations_are_served_in_order():
+    async def scenario():
+        bucket = server.TokenBucket(rate=50, capacity=1)
+        order = []
+
+        async def take(name):
+            await bucket.acquire(None)
+            order.append(name)
+
+        await asyncio.gather(*(take(i) for i in range(4)))
+        return order, bucket
+
+    order, bucket = asyncio.run(scenario())
+    assert order == [0, 1, 2, 3]
+    assert bucket.acquired == 4
+    assert bucket.waits == 3
+
+
+def test_backoff_requeues_pending_reservations():
+    async def scenario():
+        bucket = server.TokenBucket(rate=20, capacity=1)
+        assert await bucket.acquire(None)
+        waiter = asyncio.create_task(bucket.acquire(None))
+        await asyncio.sleep(0)
+        bucket.backoff(0.2)
+        started = time.monotonic()
+        assert await waiter
+        return time.monotonic() - started
+
+    # The waiter's 50 ms reservation was voided; it waits out the pause
+    assert asyncio.run(scenario()) >= 0.2
+
+
+def test_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        server.TokenBucket(rate=0, capacity=1)
+    with pytest.raises(ValueError):
+        server.TokenBucket(rate=-0.1, capacity=1)
+
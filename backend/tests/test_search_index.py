@@ -0,0 +1,43 @@
+import server
+
+
+def crypto(symbol, name, rank):
+    return server.Crypto(
+        id=name.lower().replace(" ", "-"), symbol=symbol, name=name, image="", current_price=1.0,
+        price_change_24h=0.0, price_change_percentage_24h=0.0, market_cap=1.0,
+        market_cap_rank=rank, total_volume=1.0
+    )
+
+
+CRYPTOS = [
+    crypto("wbtc", "Wrapped Bitcoin", 15),
+    crypto("eth", "Ethereum", 2),
+    crypto("btc", "Bitcoin", 1),
+    crypto("bch", "Bitcoin Cash", 18),
+    crypto("etc", "Ethereum Classic", 30),
+]
+
+
+def linear(query):
+    query = query.lower()
+    return {i for i, c in enumerate(CRYPTOS) if query in c.name.lower() or query in c.symbol.lower()}
+
+
+def test_matches_linear_scan():
+    index = server.SearchIndex.from_cryptos(CRYPTOS)
+    for query in ["b", "bt", "BTC", "bitcoin", "coin ca", "ethereum c", "thereu", "zzz", "c"]:
+        assert set(index.search(query)) == linear(query), query
+
+
+def test_ranked_by_exact_symbol_then_market_cap():
+    index = server.SearchIndex.from_cryptos(CRYPTOS)
+    names = lambda query: [CRYPTOS[i].name for i in index.search(query)]
+    assert names("btc") == ["Bitcoin", "Wrapped Bitcoin"]
+    assert names("bitcoin") == ["Bitcoin", "Wrapped Bitcoin", "Bitcoin Cash"]
+    assert names("eth") == ["Ethereum", "Ethereum Classic"]
+
+
+def test_query_does_not_span_symbol_and_name():
+    index = server.SearchIndex.from_cryptos(CRYPTOS)
+    assert index.search("ethe") == [1, 4]
+    assert index.search("cbit") == []
@@ -405,6 +405,30 @@ class CryptoAppTester:
                 
         return all_success
 
+    def test_leaderboard(self):
+        """Test leaderboard pagination and ranking order"""
+        success, response = self.run_test(
+            "Leaderboard",
+            "GET",
+            "leaderboard?limit=10",
+            200
+        )
+        
+        if success:
+            expected_fields = ['updated_at', 'total', 'offset', 'limit', 'entries', 'me']
+            missing_fields = [field for field in expected_fields if field not in response]
+            if missing_fields:
+                self.log_test("Leaderboard", False, f"Missing fields: {missing_fields}")
+                return False
+            
+            returns = [entry['return_percentage'] for entry in response['entries']]
+            if returns != sorted(returns, reverse=True):
+                self.log_test("Leaderboard", False, "Entries are not sorted by return")
+                return False
+            print(f"   {response['total']} ranked users, caller rank: {(response['me'] or {}).get('rank')}")
+            return True
+        return False
+
     def test_invalid_login(self):
         """Test login with invalid credentials"""
         invalid_login = {
@@ -470,6 +494,7 @@ class CryptoAppTester:
         # Portfolio Summary Tests (Empty Portfolio)
         print("\n📋 PORTFOLIO SUMMARY TESTS")
         self.test_portfolio_summary_empty()
+        self.test_leaderboard()
         
         # Chart Timeframe Tests
         print("\n📋 CHART TIMEFRAME TESTS")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def test_concurrent_buys():
+    """Fire parallel buys for one user and check the balance is never overdrawn"""
+    base_url = "https://readme-overhaul-1.preview.emergentagent.com"
+    api_url = f"{base_url}/api"
+
+    print("🔍 Testing Concurrent Buys")
+    print("=" * 50)
+
+    # Register user
+    timestamp = int(time.time())
+    test_user = {
+        "name": f"Concurrency Test User {timestamp}",
+        "email": f"concurrency_test{timestamp}@example.com",
+        "password": "TestPass123!"
+    }
+
+    print("1. Registering test user...")
+    response = requests.post(f"{api_url}/auth/register", json=test_user)
+    if response.status_code != 200:
+        print(f"❌ Registration failed: {response.text}")
+        return False
+
+    token = response.json()['access_token']
+    starting_balance = response.json()['user']['balance']
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    print(f"✅ User registered - Starting balance: ${starting_balance}")
+
+    # Each buy costs $1,000, so only balance / 1000 of them can succeed
+    parallel_buys = 25
+    buy_request = {
+        "crypto_id": "bitcoin",
+        "crypto_symbol": "BTC",
+        "crypto_name": "Bitcoin",
+        "quantity": 0.02,
+        "price_per_unit": 50000
+    }
+    cost = buy_request["quantity"] * buy_request["price_per_unit"]
+    expected_fills = int(starting_balance // cost)
+
+    print(f"\n2. Firing {parallel_buys} parallel ${cost:.0f} buys...")
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=parallel_buys) as pool:
+        responses = list(pool.map(
+            lambda _: requests.post(f"{api_url}/portfolio/buy", json=buy_request, headers=headers, timeout=60),
+            range(parallel_buys)
+        ))
+    elapsed = time.time() - start
+
+    fills = sum(1 for r in responses if r.status_code == 200)
+    rejections = sum(1 for r in responses if r.status_code == 400)
+    print(f"   {fills} filled, {rejections} rejected in {elapsed:.2f}s")
+    if fills != expected_fills or fills + rejections != parallel_buys:
+        print(f"❌ Expected exactly {expected_fills} fills and the rest rejected")
+        return False
+    print("✅ Fill count matches available balance")
+
+    print("\n3. Checking balance...")
+    response = requests.get(f"{api_url}/auth/me", headers=headers)
+    balance = response.json()['balance']
+    expected_balance = starting_balance - fills * cost
+    if balance < 0 or abs(balance - expected_balance) > 0.01:
+        print(f"❌ Balance ${balance}, expected ${expected_balance}")
+        return False
+    print(f"✅ Balance consistent: ${balance}")
+
+    print("\n4. Checking portfolio...")
+    response = requests.get(f"{api_url}/portfolio", headers=headers)
+    holdings = response.json()
+    if len(holdings) != 1:
+        print(f"❌ Expected 1 position, got {len(holdings)}")
+        return False
+    holding = holdings[0]
+    expected_quantity = fills * buy_request["quantity"]
+    if abs(holding['quantity'] - expected_quantity) > 1e-9 or abs(holding['total_invested'] - fills * cost) > 0.01:
+        print(f"❌ Position {holding['quantity']} / ${holding['total_invested']}, expected {expected_quantity} / ${fills * cost}")
+        return False
+    print(f"✅ Position consistent: {holding['quantity']} BTC, avg ${holding['average_buy_price']}")
+
+    print("\n5. Checking transactions...")
+    response = requests.get(f"{api_url}/transactions", headers=headers)
+    if len(response.json()) != fills:
+        print(f"❌ Expected {fills} transactions, got {len(response.json())}")
+        return False
+    print(f"✅ {fills} transactions recorded")
+
+    print(f"\n6. Firing {fills + 5} parallel sells of the same size...")
+    with ThreadPoolExecutor(max_workers=fills + 5) as pool:
+        responses = list(pool.map(
+            lambda _: requests.post(f"{api_url}/portfolio/sell", json=buy_request, headers=headers, timeout=60),
+            range(fills + 5)
+        ))
+    sells = sum(1 for r in responses if r.status_code == 200)
+    if sells != fills:
+        print(f"❌ Expected {fills} sells to succeed, got {sells}")
+        return False
+    response = requests.get(f"{api_url}/portfolio", headers=headers)
+    if response.json():
+        print(f"❌ Expected empty portfolio, got {response.json()}")
+        return False
+    print("✅ Holdings never oversold and position closed")
+
+    print("\n✅ Concurrent trade tests completed!")
+    return True
+
+if __name__ == "__main__":
+    success = test_concurrent_buys()
+    exit(0 if success else 1)
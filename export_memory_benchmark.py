@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""Show that the transaction export streams in flat memory.
+
+Seeds ROWS transactions for one synthetic user (once), then consumes the
+CSV and Parquet export generators from backend/server.py directly and
+prints the peak Python heap at checkpoints. The peak should stay roughly
+constant as the row count grows. Needs MONGO_URL (and DB_NAME) pointing
+at a scratch database. Usage:
+
+    python export_memory_benchmark.py [rows]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from pymongo import MongoClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "crypto_trading_benchmark")
+
+import server  # noqa: E402
+
+USER_ID = "export-benchmark-user"
+
+
+def seed(rows):
+    mongo = MongoClient(os.environ["MONGO_URL"])
+    transactions = mongo[os.environ["DB_NAME"]].transactions
+    existing = transactions.count_documents({"user_id": USER_ID})
+    if existing >= rows:
+        return
+    print(f"Seeding {rows - existing} transactions...")
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    for i in range(existing, rows):
+        batch.append({
+            "id": str(uuid.uuid4()),
+            "user_id": USER_ID,
+            "crypto_id": "bitcoin",
+            "crypto_symbol": "BTC",
+            "crypto_name": "Bitcoin",
+            "transaction_type": "buy" if i % 2 else "sell",
+            "quantity": 0.001,
+            "price_per_unit": 50000.0,
+            "total_amount": 50.0,
+            "timestamp": (start + timedelta(seconds=i)).isoformat()
+        })
+        if len(batch) == 10000:
+            transactions.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        transactions.insert_many(batch, ordered=False)
+    mongo.close()
+
+
+async def consume(name, stream, rows):
+    checkpoints = {rows // 10, rows // 2, rows}
+    query = server.export_query(USER_ID, None, None, None)
+    tracemalloc.start()
+    started = time.perf_counter()
+    exported = 0
+    total_bytes = 0
+    async for chunk in stream(server.export_cursor(query)):
+        total_bytes += len(chunk)
+        # Each chunk carries one batch of rows (plus the header or footer)
+        exported = min(rows, exported + server.EXPORT_BATCH_SIZE)
+        reached = [c for c in checkpoints if exported >= c]
+        for checkpoint in reached:
+            checkpoints.discard(checkpoint)
+            _, peak = tracemalloc.get_traced_memory()
+            print(f"  {name:<8} {checkpoint:>9} rows   peak heap {peak / 1024 / 1024:7.1f} MiB")
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<8} {total_bytes / 1024 / 1024:.1f} MiB in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+async def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    seed(rows)
+    print(f"🔍 Exporting {rows} transactions (batch size {server.EXPORT_BATCH_SIZE})")
+    print("=" * 60)
+    await consume("csv", server.stream_csv, rows)
+    await consume("parquet", server.stream_parquet, rows)
+    print("\n✅ Export memory benchmark completed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+import { useEffect, useState } from "react";
+import axios from "axios";
+
+// Subscribe to /stream/prices for the given coin ids and return { [id]: price }.
+// The server sends one snapshot and then only per-coin deltas.
+export function usePriceStream(cryptoIds) {
+  const [prices, setPrices] = useState({});
+  const key = [...new Set(cryptoIds)].sort().join(",");
+
+  useEffect(() => {
+    if (!key) {
+      setPrices({});
+      return;
+    }
+
+    const source = new EventSource(`${axios.defaults.baseURL}/stream/prices?ids=${encodeURIComponent(key)}`);
+    const toPriceMap = (event) => {
+      const update = {};
+      Object.entries(JSON.parse(event.data).prices).forEach(([id, tick]) => {
+        update[id] = tick.current_price;
+      });
+      return update;
+    };
+
+    source.addEventListener("snapshot", (event) => setPrices(toPriceMap(event)));
+    source.addEventListener("delta", (event) => setPrices(prev => ({ ...prev, ...toPriceMap(event) })));
+    source.onerror = () => console.error("Price stream disconnected, retrying");
+
+    return () => source.close();
+  }, [key]);
+
+  return prices;
+}
@@ -10,12 +10,17 @@ import { toast } from "sonner";
 import { ArrowLeft, TrendingUp, TrendingDown } from "lucide-react";
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from "recharts";
 
+// Quote fields may be null when the source does not know them
+const formatUsd = (value, options) =>
+  value == null ? "—" : `$${value.toLocaleString('en-US', options)}`;
+
 const CryptoDetail = ({ user, onLogout, onUpdateUser }) => {
   const { cryptoId } = useParams();
   const navigate = useNavigate();
   const [crypto, setCrypto] = useState(null);
   const [chartData, setChartData] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [notFound, setNotFound] = useState(false);
   const [buyQuantity, setBuyQuantity] = useState("");
   const [sellQuantity, setSellQuantity] = useState("");
   const [portfolio, setPortfolio] = useState(null);
@@ -36,8 +41,12 @@ const CryptoDetail = ({ user, onLogout, onUpdateUser }) => {
     }
     
     try {
-      const response = await axios.get(`/cryptos/${cryptoId}?days=${timePeriod}`);
-      setCrypto(response.data.crypto);
+      // The chart cannot show more points than it has pixels
+      const points = Math.min(2000, Math.max(50, window.innerWidth));
+      const response = await axios.get(`/cryptos/${cryptoId}?days=${timePeriod}&points=${points}`);
+      setNotFound(false);
+      // A partial response may carry the chart without a quote; keep the last quote for this coin
+      setCrypto((previous) => response.data.crypto ?? (previous?.id === cryptoId ? previous : null));
       
       // Format chart data
       if (response.data.chart && response.data.chart.length > 0) {
@@ -65,7 +74,9 @@ const CryptoDetail = ({ user, onLogout, onUpdateUser }) => {
       }
     } catch (error) {
       console.error("Failed to fetch crypto details", error);
-      if (error.response?.status === 503) {
+      if (error.response?.status === 404) {
+        setNotFound(true);
+      } else if (error.response?.status === 503) {
         toast.error("Market data temporarily unavailable. Please try again in a moment.");
       } else {
         toast.error("Failed to load cryptocurrency details");
@@ -171,7 +182,7 @@ const CryptoDetail = ({ user, onLogout, onUpdateUser }) => {
     );
   }
 
-  if (!crypto) {
+  if (notFound) {
     return (
       <Layout user={user} onLogout={onLogout}>
         <div className="text-center py-12 text-slate-600">Cryptocurrency not found</div>
@@ -179,6 +190,18 @@ const CryptoDetail = ({ user, onLogout, onUpdateUser }) => {
     );
   }
 
+  if (!crypto && chartData.length === 0) {
+    return (
+      <Layout user={user} onLogout={onLogout}>
+        <div className="text-center py-12 text-slate-600">Cryptocurrency details temporarily unavailable</div>
+      </Layout>
+    );
+  }
+
+  // Trading needs a price; the chart can still be shown without one
+  const tradable = crypto?.current_price != null;
+  const symbol = crypto?.symbol?.toUpperCase() ?? cryptoId;
+
   return (
     <Layout user={user} onLogout={onLogout}>
       <div className="space-y-8" data-testid="crypto-detail">
@@ -190,41 +213,51 @@ const CryptoDetail = ({ user, onLogout, onUpdateUser }) => {
 
         {/* Crypto Header */}
         <div className="flex items-center gap-3 sm:gap-4">
-          <img src={crypto.image} alt={crypto.name} className="w-12 h-12 sm:w-16 sm:h-16 rounded-full" />
+          {crypto?.image && <img src={crypto.image} alt={crypto.name} className="w-12 h-12 sm:w-16 sm:h-16 rounded-full" />}
           <div>
-            <h1 className="text-2xl sm:text-3xl md:text-4xl font-bold text-slate-800">{crypto.name}</h1>
-            <p className="text-sm sm:text-base text-slate-600">{crypto.symbol.toUpperCase()}</p>
+            <h1 className="text-2xl sm:text-3xl md:text-4xl font-bold text-slate-800">{crypto?.name ?? cryptoId}</h1>
+            <p className="text-sm sm:text-base text-slate-600">{symbol}</p>
           </div>
         </div>
 
         {/* Price Info */}
         <Card>
           <CardContent className="pt-4 sm:pt-6">
-            <div className="grid grid-cols-1 md:grid-cols-3 gap-4 sm:gap-6">
-              <div>
-                <div className="text-xs sm:text-sm text-slate-600 mb-1">Current Price</div>
-                <div className="text-xl sm:text-2xl md:text-3xl font-bold text-slate-800" data-testid="current-price">
-                  ${crypto.current_price.toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 })}
-                </div>
+            {!crypto ? (
+              <div className="text-center py-4 text-slate-600 text-sm sm:text-base" data-testid="quote-unavailable">
+                Price data temporarily unavailable
               </div>
-              <div>
-                <div className="text-xs sm:text-sm text-slate-600 mb-1">24h Change</div>
-                <div
-                  className={`text-lg sm:text-xl md:text-2xl font-bold flex items-center gap-2 ${
-                    crypto.price_change_percentage_24h >= 0 ? 'text-green-600' : 'text-red-600'
-                  }`}
-                >
-                  {crypto.price_change_percentage_24h >= 0 ? <TrendingUp className="w-5 h-5 sm:w-6 sm:h-6" /> : <TrendingDown className="w-5 h-5 sm:w-6 sm:h-6" />}
-                  {Math.abs(crypto.price_change_percentage_24h).toFixed(2)}%
+            ) : (
+              <div className="grid grid-cols-1 md:grid-cols-3 gap-4 sm:gap-6">
+                <div>
+                  <div className="text-xs sm:text-sm text-slate-600 mb-1">Current Price</div>
+                  <div className="text-xl sm:text-2xl md:text-3xl font-bold text-slate-800" data-testid="current-price">
+                    {formatUsd(crypto.current_price, { minimumFractionDigits: 2, maximumFractionDigits: 2 })}
+                  </div>
                 </div>
-              </div>
-              <div>
-                <div className="text-xs sm:text-sm text-slate-600 mb-1">Market Cap</div>
-                <div className="text-lg sm:text-xl md:text-2xl font-bold text-slate-800">
-                  ${(crypto.market_cap / 1e9).toFixed(2)}B
+                <div>
+                  <div className="text-xs sm:text-sm text-slate-600 mb-1">24h Change</div>
+                  {crypto.price_change_percentage_24h == null ? (
+                    <div className="text-lg sm:text-xl md:text-2xl font-bold text-slate-800">—</div>
+                  ) : (
+                    <div
+                      className={`text-lg sm:text-xl md:text-2xl font-bold flex items-center gap-2 ${
+                        crypto.price_change_percentage_24h >= 0 ? 'text-green-600' : 'text-red-600'
+                      }`}
+                    >
+                      {crypto.price_change_percentage_24h >= 0 ? <TrendingUp className="w-5 h-5 sm:w-6 sm:h-6" /> : <TrendingDown className="w-5 h-5 sm:w-6 sm:h-6" />}
+                      {Math.abs(crypto.price_change_percentage_24h).toFixed(2)}%
+                    </div>
+                  )}
+                </div>
+                <div>
+                  <div className="text-xs sm:text-sm text-slate-600 mb-1">Market Cap</div>
+                  <div className="text-lg sm:text-xl md:text-2xl font-bold text-slate-800">
+                    {crypto.market_cap == null ? "—" : `$${(crypto.market_cap / 1e9).toFixed(2)}B`}
+                  </div>
                 </div>
               </div>
-            </div>
+            )}
           </CardContent>
         </Card>
 
@@ -304,90 +337,102 @@ const CryptoDetail = ({ user, onLogout, onUpdateUser }) => {
         </Card>
 
         {/* Trading Section */}
-        <div className="grid grid-cols-1 lg:grid-cols-2 gap-4 sm:gap-6">
-          {/* Buy */}
-          <Card data-testid="buy-card">
-            <CardHeader className="p-4 sm:p-6">
-              <CardTitle className="text-base sm:text-lg">Buy {crypto.symbol.toUpperCase()}</CardTitle>
-            </CardHeader>
-            <CardContent className="space-y-3 sm:space-y-4">
-              <div className="p-4 sm:p-6 bg-slate-50 rounded-lg space-y-2 sm:space-y-3">
-                <div className="flex justify-between text-xs sm:text-sm">
-                  <span className="text-slate-600">Current Price:</span>
-                  <span className="font-medium text-base sm:text-lg">${crypto.current_price.toFixed(2)}</span>
-                </div>
-                <div className="flex justify-between text-xs sm:text-sm">
-                  <span className="text-slate-600">Your Balance:</span>
-                  <span className="font-medium text-sm sm:text-base">${user.balance.toFixed(2)}</span>
+        {tradable ? (
+          <div className="grid grid-cols-1 lg:grid-cols-2 gap-4 sm:gap-6">
+            {/* Buy */}
+            <Card data-testid="buy-card">
+              <CardHeader className="p-4 sm:p-6">
+                <CardTitle className="text-base sm:text-lg">Buy {symbol}</CardTitle>
+              </CardHeader>
+              <CardContent className="space-y-3 sm:space-y-4">
+                <div className="p-4 sm:p-6 bg-slate-50 rounded-lg space-y-2 sm:space-y-3">
+                  <div className="flex justify-between text-xs sm:text-sm">
+                    <span className="text-slate-600">Current Price:</span>
+                    <span className="font-medium text-base sm:text-lg">${crypto.current_price.toFixed(2)}</span>
+                  </div>
+                  <div className="flex justify-between text-xs sm:text-sm">
+                    <span className="text-slate-600">Your Balance:</span>
+                    <span className="font-medium text-sm sm:text-base">${user.balance.toFixed(2)}</span>
+                  </div>
                 </div>
-              </div>
-              <Button
-                className="w-full bg-blue-600 hover:bg-blue-700 text-sm sm:text-base"
-                onClick={() => setBuyDialogOpen(true)}
-                data-testid="buy-button"
-              >
-                Buy {crypto.symbol.toUpperCase()}
-              </Button>
-            </CardContent>
-          </Card>
+                <Button
+                  className="w-full bg-blue-600 hover:bg-blue-700 text-sm sm:text-base"
+                  onClick={() => setBuyDialogOpen(true)}
+                  data-testid="buy-button"
+                >
+                  Buy {symbol}
+                </Button>
+              </CardContent>
+            </Card>
 
-          {/* Sell */}
-          <Card data-testid="sell-card">
-            <CardHeader className="p-4 sm:p-6">
-              <CardTitle className="text-base sm:text-lg">Sell {crypto.symbol.toUpperCase()}</CardTitle>
-            </CardHeader>
-            <CardContent className="space-y-3 sm:space-y-4">
-              <div className="p-4 sm:p-6 bg-slate-50 rounded-lg space-y-2 sm:space-y-3">
-                <div className="flex justify-between text-xs sm:text-sm">
-                  <span className="text-slate-600">Current Price:</span>
-                  <span className="font-medium text-base sm:text-lg">${crypto.current_price.toFixed(2)}</span>
-                </div>
-                <div className="flex justify-between text-xs sm:text-sm">
-                  <span className="text-slate-600">Your Holdings:</span>
-                  <span className="font-medium text-sm sm:text-base">
-                    {portfolio ? portfolio.quantity.toFixed(4) : '0.0000'} {crypto.symbol.toUpperCase()}
-                  </span>
+            {/* Sell */}
+            <Card data-testid="sell-card">
+              <CardHeader className="p-4 sm:p-6">
+                <CardTitle className="text-base sm:text-lg">Sell {symbol}</CardTitle>
+              </CardHeader>
+              <CardContent className="space-y-3 sm:space-y-4">
+                <div className="p-4 sm:p-6 bg-slate-50 rounded-lg space-y-2 sm:space-y-3">
+                  <div className="flex justify-between text-xs sm:text-sm">
+                    <span className="text-slate-600">Current Price:</span>
+                    <span className="font-medium text-base sm:text-lg">${crypto.current_price.toFixed(2)}</span>
+                  </div>
+                  <div className="flex justify-between text-xs sm:text-sm">
+                    <span className="text-slate-600">Your Holdings:</span>
+                    <span className="font-medium text-sm sm:text-base">
+                      {portfolio ? portfolio.quantity.toFixed(4) : '0.0000'} {symbol}
+                    </span>
+                  </div>
                 </div>
-              </div>
-              <Button
-                className="w-full bg-red-600 hover:bg-red-700 text-sm sm:text-base"
-                onClick={() => setSellDialogOpen(true)}
-                disabled={!portfolio}
-                data-testid="sell-button"
-              >
-                Sell {crypto.symbol.toUpperCase()}
-              </Button>
+                <Button
+                  className="w-full bg-red-600 hover:bg-red-700 text-sm sm:text-base"
+                  onClick={() => setSellDialogOpen(true)}
+                  disabled={!portfolio}
+                  data-testid="sell-button"
+                >
+                  Sell {symbol}
+                </Button>
+              </CardContent>
+            </Card>
+          </div>
+        ) : (
+          <Card data-testid="trading-unavailable">
+            <CardContent className="pt-4 sm:pt-6 text-center text-slate-600 text-sm sm:text-base">
+              Trading is unavailable until a current price is available
             </CardContent>
           </Card>
-        </div>
+        )}
       </div>
 
       {/* Transaction Dialogs */}
-      <TransactionDialog
-        open={buyDialogOpen}
-        onOpenChange={setBuyDialogOpen}
-        type="buy"
-        crypto={crypto}
-        quantity={buyQuantity}
-        onQuantityChange={setBuyQuantity}
-        onConfirm={handleBuy}
-        processing={processing}
-        user={user}
-        portfolio={portfolio}
-      />
+      {tradable && (
+        <>
+          <TransactionDialog
+            open={buyDialogOpen}
+            onOpenChange={setBuyDialogOpen}
+            type="buy"
+            crypto={crypto}
+            quantity={buyQuantity}
+            onQuantityChange={setBuyQuantity}
+            onConfirm={handleBuy}
+            processing={processing}
+            user={user}
+            portfolio={portfolio}
+          />
 
-      <TransactionDialog
-        open={sellDialogOpen}
-        onOpenChange={setSellDialogOpen}
-        type="sell"
-        crypto={crypto}
-        quantity={sellQuantity}
-        onQuantityChange={setSellQuantity}
-        onConfirm={handleSell}
-        processing={processing}
-        user={user}
-        portfolio={portfolio}
-      />
+          <TransactionDialog
+            open={sellDialogOpen}
+            onOpenChange={setSellDialogOpen}
+            type="sell"
+            crypto={crypto}
+            quantity={sellQuantity}
+            onQuantityChange={setSellQuantity}
+            onConfirm={handleSell}
+            processing={processing}
+            user={user}
+            portfolio={portfolio}
+          />
+        </>
+      )}
     </Layout>
   );
 };
@@ -4,10 +4,10 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import axios from "axios";
 import { Wallet, TrendingUp, TrendingDown, Activity } from "lucide-react";
 import { useNavigate } from "react-router-dom";
+import { usePriceStream } from "@/hooks/use-price-stream";
 
 const Dashboard = ({ user, onLogout, onUpdateUser }) => {
   const [portfolio, setPortfolio] = useState([]);
-  const [cryptoPrices, setCryptoPrices] = useState({});
   const [topPerformers, setTopPerformers] = useState([]);
   const [topLosers, setTopLosers] = useState([]);
   const [stats, setStats] = useState({
@@ -18,77 +18,69 @@ const Dashboard = ({ user, onLogout, onUpdateUser }) => {
   });
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
+  // Live prices for held coins, pushed by the server instead of polled
+  const cryptoPrices = usePriceStream(portfolio.map(item => item.crypto_id));
 
   useEffect(() => {
     fetchPortfolio();
-    // Refresh prices every 30 seconds
-    const interval = setInterval(fetchPortfolio, 30000);
-    return () => clearInterval(interval);
   }, []);
 
-  const fetchPortfolio = async () => {
-    try {
-      const portfolioResponse = await axios.get("/portfolio");
-      const portfolioData = portfolioResponse.data;
-      setPortfolio(portfolioData);
+  useEffect(() => {
+    if (portfolio.length === 0) {
+      setStats({
+        totalValue: 0,
+        totalProfit: 0,
+        profitPercentage: 0,
+        totalInvested: 0
+      });
+      setTopPerformers([]);
+      setTopLosers([]);
+      return;
+    }
 
-      if (portfolioData.length > 0) {
-        // Fetch current prices for all cryptos
-        const pricesResponse = await axios.get(`/cryptos`);
-        
-        const pricesMap = {};
-        pricesResponse.data.forEach(crypto => {
-          pricesMap[crypto.id] = crypto.current_price;
-        });
-        setCryptoPrices(pricesMap);
+    // Calculate stats
+    let totalValue = 0;
+    let totalInvested = 0;
+    const holdingsWithPerformance = [];
 
-        // Calculate stats
-        let totalValue = 0;
-        let totalInvested = 0;
-        const holdingsWithPerformance = [];
+    portfolio.forEach(item => {
+      const currentPrice = cryptoPrices[item.crypto_id] || 0;
+      const itemValue = item.quantity * currentPrice;
+      totalValue += itemValue;
+      totalInvested += item.total_invested;
+      
+      const profit = itemValue - item.total_invested;
+      const profitPercentage = item.total_invested > 0 ? (profit / item.total_invested) * 100 : 0;
+      
+      holdingsWithPerformance.push({
+        ...item,
+        current_price: currentPrice,
+        current_value: itemValue,
+        profit,
+        profitPercentage
+      });
+    });
 
-        portfolioData.forEach(item => {
-          const currentPrice = pricesMap[item.crypto_id] || 0;
-          const itemValue = item.quantity * currentPrice;
-          totalValue += itemValue;
-          totalInvested += item.total_invested;
-          
-          const profit = itemValue - item.total_invested;
-          const profitPercentage = item.total_invested > 0 ? (profit / item.total_invested) * 100 : 0;
-          
-          holdingsWithPerformance.push({
-            ...item,
-            current_price: currentPrice,
-            current_value: itemValue,
-            profit,
-            profitPercentage
-          });
-        });
+    const totalProfit = totalValue - totalInvested;
+    const profitPercentage = totalInvested > 0 ? (totalProfit / totalInvested) * 100 : 0;
 
-        const totalProfit = totalValue - totalInvested;
-        const profitPercentage = totalInvested > 0 ? (totalProfit / totalInvested) * 100 : 0;
+    setStats({
+      totalValue,
+      totalProfit,
+      profitPercentage,
+      totalInvested
+    });
 
-        setStats({
-          totalValue,
-          totalProfit,
-          profitPercentage,
-          totalInvested
-        });
+    // Get top performers and losers
+    const sorted = [...holdingsWithPerformance].sort((a, b) => b.profitPercentage - a.profitPercentage);
+    setTopPerformers(sorted.slice(0, 3));
+    setTopLosers(sorted.slice(-3).reverse());
+  }, [portfolio, cryptoPrices]);
 
-        // Get top performers and losers
-        const sorted = [...holdingsWithPerformance].sort((a, b) => b.profitPercentage - a.profitPercentage);
-        setTopPerformers(sorted.slice(0, 3));
-        setTopLosers(sorted.slice(-3).reverse());
-      } else {
-        setStats({
-          totalValue: 0,
-          totalProfit: 0,
-          profitPercentage: 0,
-          totalInvested: 0
-        });
-        setTopPerformers([]);
-        setTopLosers([]);
-      }
+  const fetchPortfolio = async () => {
+    try {
+      const portfolioResponse = await axios.get("/portfolio");
+      setPortfolio(portfolioResponse.data);
     } catch (error) {
       console.error("Failed to fetch portfolio", error);
     } finally {
@@ -7,40 +7,27 @@ import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import { Wallet, TrendingUp, TrendingDown, ShoppingCart } from "lucide-react";
 import { toast } from "sonner";
+import { usePriceStream } from "@/hooks/use-price-stream";
 
 const Portfolio = ({ user, onLogout, onUpdateUser }) => {
   const [portfolio, setPortfolio] = useState([]);
-  const [cryptoPrices, setCryptoPrices] = useState({});
   const [loading, setLoading] = useState(true);
   const [sellDialogOpen, setSellDialogOpen] = useState(false);
   const [selectedCrypto, setSelectedCrypto] = useState(null);
   const [sellQuantity, setSellQuantity] = useState("");
   const [processing, setProcessing] = useState(false);
   const navigate = useNavigate();
+  // Live prices for held coins, pushed by the server instead of polled
+  const cryptoPrices = usePriceStream(portfolio.map(item => item.crypto_id));
 
   useEffect(() => {
     fetchPortfolio();
-    // Refresh prices every 30 seconds
-    const interval = setInterval(fetchPortfolio, 30000);
-    return () => clearInterval(interval);
   }, []);
 
   const fetchPortfolio = async () => {
     try {
       const portfolioResponse = await axios.get("/portfolio");
-      const portfolioData = portfolioResponse.data;
-      setPortfolio(portfolioData);
-
-      if (portfolioData.length > 0) {
-        // Fetch current prices
-        const pricesResponse = await axios.get(`/cryptos`);
-        
-        const pricesMap = {};
-        pricesResponse.data.forEach(crypto => {
-          pricesMap[crypto.id] = crypto.current_price;
-        });
-        setCryptoPrices(pricesMap);
-      }
+      setPortfolio(portfolioResponse.data);
     } catch (error) {
       console.error("Failed to fetch portfolio", error);
     } finally {
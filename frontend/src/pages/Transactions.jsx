@@ -1,28 +1,40 @@
 import { useState, useEffect } from "react";
 import Layout from "@/components/Layout";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
+import { Button } from "@/components/ui/button";
 import axios from "axios";
 import { ArrowUpRight, ArrowDownRight } from "lucide-react";
 
 const Transactions = ({ user, onLogout, onUpdateUser }) => {
   const [transactions, setTransactions] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchTransactions();
   }, []);
 
-  const fetchTransactions = async () => {
+  const fetchTransactions = async (before = null) => {
     try {
-      const response = await axios.get("/transactions");
-      setTransactions(response.data);
+      const response = await axios.get("/transactions", {
+        params: before ? { before } : {}
+      });
+      setTransactions(prev => (before ? [...prev, ...response.data] : response.data));
+      setNextCursor(response.headers["x-next-cursor"] || null);
     } catch (error) {
       console.error("Failed to fetch transactions", error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchTransactions(nextCursor);
+  };
+
   const formatDate = (dateString) => {
     const date = new Date(dateString);
     return date.toLocaleString('en-US', {
@@ -101,6 +113,13 @@ const Transactions = ({ user, onLogout, onUpdateUser }) => {
                     </div>
                   </div>
                 ))}
+                {nextCursor && (
+                  <div className="text-center pt-2">
+                    <Button variant="outline" onClick={loadMore} disabled={loadingMore} data-testid="load-more-transactions">
+                      {loadingMore ? "Loading..." : "Load more"}
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
           </CardContent>
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""Compare a fresh httpx.AsyncClient per request against one shared pooled client.
+
+Runs against a local stub server so the numbers only reflect connection
+setup cost, not CoinGecko latency. Usage:
+
+    python http_client_benchmark.py [requests] [--tls]
+"""
+
+import asyncio
+import json
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+PAYLOAD = json.dumps([{"id": f"coin-{i}", "current_price": i * 1.5} for i in range(100)]).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(use_tls):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    if use_tls:
+        cert_dir = Path(tempfile.mkdtemp())
+        cert, key = cert_dir / "cert.pem", cert_dir / "key.pem"
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=127.0.0.1", "-keyout", str(key), "-out", str(cert)],
+            check=True, capture_output=True
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scheme = "https" if use_tls else "http"
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/coins/markets"
+
+
+async def per_request_client(url, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=30.0, verify=False) as client:
+            response = await client.get(url)
+            response.json()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def shared_client(url, count):
+    timings = []
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(15.0, connect=5.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+        verify=False
+    ) as client:
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.get(url)
+            response.json()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{name:<22} mean {statistics.mean(timings):7.3f} ms   p50 {statistics.median(timings):7.3f} ms   p99 {p99:7.3f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 500
+    use_tls = "--tls" in sys.argv
+    server, url = start_stub_server(use_tls)
+
+    print(f"🔍 {count} sequential GETs against {url}")
+    print("=" * 70)
+    fresh = report("client per request", asyncio.run(per_request_client(url, count)))
+    shared = report("shared pooled client", asyncio.run(shared_client(url, count)))
+    print("=" * 70)
+    print(f"✅ Saving per request: {fresh - shared:.3f} ms ({fresh / shared:.1f}x faster)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
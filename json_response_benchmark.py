@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""Compare /api/cryptos throughput with model validation against pre-encoded bytes.
+
+Seeds the market cache of backend/server.py with COINS synthetic coins and
+drives the app in-process over ASGI, so only routing and serialization are
+measured. "before" re-declares the old handler (response_model=List[Crypto],
+models returned and re-serialized per request); "after" is the real
+handler serving cached JSON bytes. Usage:
+
+    python json_response_benchmark.py [requests] [coins]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "crypto_trading_benchmark")
+
+import server  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def build_cryptos(count):
+    return [
+        server.Crypto(
+            id=f"coin-{i}",
+            symbol=f"c{i}",
+            name=f"Coin {i}",
+            image=f"https://example.com/coin-{i}.png",
+            current_price=1000.0 / (i + 1),
+            price_change_24h=1.5,
+            price_change_percentage_24h=0.25,
+            market_cap=1e9 / (i + 1),
+            market_cap_rank=i + 1,
+            total_volume=1e7
+        )
+        for i in range(count)
+    ]
+
+
+def baseline_app():
+    app = FastAPI(default_response_class=JSONResponse)
+
+    @app.get("/api/cryptos", response_model=List[server.Crypto])
+    async def get_cryptos(search: Optional[str] = None):
+        cryptos = await server.get_cached_crypto_list()
+        if search:
+            search_lower = search.lower()
+            cryptos = [c for c in cryptos if search_lower in c.name.lower() or search_lower in c.symbol.lower()]
+        return cryptos
+
+    return app
+
+
+async def requests_per_second(app, path, count):
+    transport = httpx.ASGITransport(app=app)
+    # Uncompressed, so only serialization is compared
+    headers = {"Accept-Encoding": "identity"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers=headers) as client:
+        reference = (await client.get(path)).json()
+        started = time.perf_counter()
+        for _ in range(count):
+            response = await client.get(path)
+            response.raise_for_status()
+        elapsed = time.perf_counter() - started
+    return count / elapsed, reference
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    coins = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    server.market_cache.set("crypto_list", build_cryptos(coins))
+    before_app = baseline_app()
+
+    print(f"🔍 {count} in-process requests, {coins} coins cached")
+    print("=" * 60)
+    for path in ("/api/cryptos", "/api/cryptos?search=coin 1"):
+        before, expected = await requests_per_second(before_app, path, count)
+        after, actual = await requests_per_second(server.app, path, count)
+        if actual != expected:
+            print(f"❌ {path}: pre-encoded body differs from the validated one")
+            return False
+        print(f"{path:<28} before {before:8.0f} req/s   after {after:8.0f} req/s   ({after / before:.1f}x)")
+    print("\n✅ JSON response benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    success = asyncio.run(main())
+    exit(0 if success else 1)
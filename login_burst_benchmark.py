@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""Measure /api/cryptos latency while a burst of logins hits the server.
+
+With bcrypt on the event loop every login stalls all other requests for
+100-300 ms; with the hashing pool /api/cryptos should stay close to its
+idle latency. Usage:
+
+    python login_burst_benchmark.py [base_url] [logins]
+"""
+
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[max(0, int(len(values) * pct) - 1)]
+
+
+def sample_cryptos(api_url, stop, timings):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = session.get(f"{api_url}/cryptos", timeout=30)
+        if response.status_code == 200:
+            timings.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+
+
+def measure(api_url, duration=None, burst=None):
+    timings = []
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_cryptos, args=(api_url, stop, timings))
+    sampler.start()
+    statuses = {}
+    if burst:
+        statuses = burst()
+    else:
+        time.sleep(duration)
+    stop.set()
+    sampler.join()
+    return timings, statuses
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8001"
+    logins = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    api_url = f"{base_url}/api"
+
+    print("🔍 Login Burst Benchmark")
+    print("=" * 50)
+
+    timestamp = int(time.time())
+    user = {
+        "name": f"Burst Test User {timestamp}",
+        "email": f"burst_test{timestamp}@example.com",
+        "password": "TestPass123!"
+    }
+    response = requests.post(f"{api_url}/auth/register", json=user)
+    if response.status_code != 200:
+        print(f"❌ Registration failed: {response.text}")
+        return False
+
+    # Warm the market list cache before measuring
+    requests.get(f"{api_url}/cryptos", timeout=30)
+
+    idle, _ = measure(api_url, duration=3)
+
+    def burst():
+        statuses = {}
+
+        def login(_):
+            return requests.post(
+                f"{api_url}/auth/login",
+                json={"email": user["email"], "password": user["password"]},
+                timeout=60
+            ).status_code
+
+        with ThreadPoolExecutor(max_workers=logins) as pool:
+            for status_code in pool.map(login, range(logins)):
+                statuses[status_code] = statuses.get(status_code, 0) + 1
+        return statuses
+
+    busy, statuses = measure(api_url, burst=burst)
+
+    for name, timings in (("idle", idle), (f"{logins} logins", busy)):
+        if not timings:
+            print(f"❌ No /cryptos samples during {name}")
+            return False
+        print(f"/cryptos during {name:<12} n={len(timings):<4} "
+              f"p50 {statistics.median(timings):7.1f} ms   p99 {percentile(timings, 0.99):7.1f} ms")
+    print(f"Login status codes: {statuses}")
+    print("\n✅ Login burst benchmark completed!")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
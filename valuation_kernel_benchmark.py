@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""Compare the per-holding dict loop against the vectorized valuation kernel.
+
+Builds USERS synthetic users with HOLDINGS positions each over a 250 coin
+universe, values every portfolio once with the original Python loop and
+once with valuation_kernel from backend/server.py, checks both agree and
+prints the timings. Usage:
+
+    python valuation_kernel_benchmark.py [users] [holdings]
+"""
+
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "crypto_trading_benchmark")
+
+import server  # noqa: E402
+
+COINS = 250
+
+
+def build_positions(users, holdings):
+    rng = random.Random(42)
+    coin_ids = [f"coin-{i}" for i in range(COINS)]
+    positions = []
+    for u in range(users):
+        for crypto_id in rng.sample(coin_ids, holdings):
+            quantity = rng.uniform(0.01, 10)
+            positions.append({
+                "user_id": f"user-{u}",
+                "crypto_id": crypto_id,
+                "quantity": quantity,
+                "total_invested": quantity * rng.uniform(1, 1000)
+            })
+    prices = {crypto_id: rng.uniform(1, 1000) for crypto_id in coin_ids}
+    return positions, prices
+
+
+def dict_loop(positions, prices):
+    """The per-holding valuation the summary endpoint used to run."""
+    totals = {}
+    holding_percentages = []
+    for position in positions:
+        current_value = position["quantity"] * prices.get(position["crypto_id"], 0)
+        profit = current_value - position["total_invested"]
+        profit_percentage = (profit / position["total_invested"] * 100) if position["total_invested"] > 0 else 0
+        holding_percentages.append(profit_percentage)
+        value, invested = totals.get(position["user_id"], (0.0, 0.0))
+        totals[position["user_id"]] = (value + current_value, invested + position["total_invested"])
+    users = {
+        user_id: (value, (value - invested) / invested * 100 if invested > 0 else 0)
+        for user_id, (value, invested) in totals.items()
+    }
+    return users, holding_percentages
+
+
+def kernel(columns, prices):
+    return server.valuation_kernel(columns, columns.price_vector(prices))
+
+
+def best_of(fn, *args, runs=5):
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    holdings = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    positions, prices = build_positions(users, holdings)
+
+    print(f"🔍 Valuing {users} users x {holdings} holdings ({len(positions)} positions)")
+    print("=" * 60)
+    loop_ms, (expected, expected_holdings) = best_of(dict_loop, positions, prices)
+    factorize_ms, columns = best_of(server.HoldingColumns.from_positions, positions, runs=1)
+    kernel_ms, valued = best_of(kernel, columns, prices)
+
+    for i, user_id in enumerate(columns.user_ids):
+        value, profit_percentage = expected[user_id]
+        if abs(valued["user_value"][i] - value) > 1e-6 * max(1.0, value) or \
+                abs(valued["user_profit_percentage"][i] - profit_percentage) > 1e-6:
+            print(f"❌ Mismatch for {user_id}")
+            return False
+    for i, profit_percentage in enumerate(expected_holdings):
+        if abs(valued["profit_percentage"][i] - profit_percentage) > 1e-6:
+            print(f"❌ Mismatch for holding {i}")
+            return False
+
+    print(f"dict loop              {loop_ms:9.1f} ms")
+    print(f"kernel (per tick)      {kernel_ms:9.1f} ms")
+    print(f"factorize (once)       {factorize_ms:9.1f} ms")
+    print("=" * 60)
+    print(f"✅ Kernel {loop_ms / kernel_ms:.1f}x faster per revaluation, results match")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)